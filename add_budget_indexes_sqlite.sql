@@ -0,0 +1,13 @@
+-- Add budget query indexes (SQLite, matching what create_all builds there)
+
+-- Overlap check for active budgets of a project
+CREATE INDEX ix_budget_project_active_range ON budgets(project_id, start_date, end_date);
+
+-- Latest transactions and 30-day window per budget
+CREATE INDEX ix_bt_budget_created ON budget_transactions(budget_id, created_at DESC);
+
+-- Unacknowledged alerts per budget
+CREATE INDEX ix_ba_budget_unack ON budget_alerts(budget_id);
+
+-- Pending requests per organization
+CREATE INDEX ix_er_org_pending ON expense_requests(organization_id);
@@ -0,0 +1,6 @@
+-- Add critical_exceeded_at column to budgets table
+ALTER TABLE budgets ADD COLUMN critical_exceeded_at TIMESTAMP NULL;
+
+-- Backfill budgets that are already at or past their critical threshold
+UPDATE budgets SET critical_exceeded_at = updated_at
+WHERE total_amount > 0 AND spent_amount * 100 >= critical_threshold * total_amount;
@@ -0,0 +1,3 @@
+-- One budget transaction per expense, so retried charges are ignored
+-- (remove duplicated (budget_id, expense_id) rows before running)
+CREATE UNIQUE INDEX ux_bt_budget_expense ON budget_transactions(budget_id, expense_id);
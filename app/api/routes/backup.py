@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.api.deps import get_current_user, get_db
 from app.models.user import User
-from app.services.backup_service import backup_service
+from app.services.backup_service import METADATA_SIDECAR_SUFFIX, backup_service
 from pydantic import BaseModel
 import os
 
@@ -186,6 +186,9 @@ async def delete_backup(
             shutil.rmtree(backup_path)
         else:
             os.remove(backup_path)
+            sidecar = backup_path + METADATA_SIDECAR_SUFFIX
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
         
         return {
             "message": f"Backup '{backup_name}' deleted successfully"
@@ -110,13 +110,10 @@ async def list_budgets(
                     "total_amount": b.total_amount,
                     "spent_amount": b.spent_amount,
                     "remaining_amount": b.remaining_amount,
-                    "utilization_percentage": b.utilization_percentage,
                     "start_date": b.start_date.isoformat(),
                     "end_date": b.end_date.isoformat(),
                     "project_id": b.project_id,
-                    "is_warning_exceeded": b.is_warning_threshold_exceeded,
-                    "is_critical_exceeded": b.is_critical_threshold_exceeded,
-                    "is_over_budget": b.is_over_budget
+                    **b.utilization_metrics()
                 }
                 for b in budgets
             ]
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import json
 from app.core.database import get_db
 from app.models.user import User
 from app.models.client import Client, WhatsAppMessage
@@ -299,3 +301,32 @@ async def send_message_to_client(
     db.commit()
     
     return {"status": "sent", "message_sid": message_sid}
+
+
+@router.post("/{client_id}/ai-draft")
+async def stream_ai_draft(
+    client_id: int,
+    message: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_manager_user)
+):
+    """Stream an AI-drafted reply to a client message as server-sent events."""
+    client = db.query(Client).filter(
+        Client.id == client_id,
+        Client.organization_id == current_user.organization_id
+    ).first()
+    
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Client not found"
+        )
+    
+    context = f"Cliente: {client.name}, Empresa: {client.company or 'N/A'}"
+    
+    async def event_stream():
+        async for chunk in ai_service.stream_response(message=message, context=context):
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
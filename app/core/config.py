@@ -21,6 +21,7 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = ""
     GROQ_API_KEY: str = ""
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # Keep model (and prompt KV cache) loaded between requests
     
     # WhatsApp Provider
     WHATSAPP_PROVIDER: str = "twilio"  # twilio, whatsapp-web, baileys
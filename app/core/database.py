@@ -1,17 +1,32 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+if "sqlite" in settings.DATABASE_URL:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False}
+    )
+else:
+    # Pool dimensionado para consultas concurrentes (p. ej. chat del asistente IA)
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=20,
+        max_overflow=40,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Thread pool for blocking ORM calls made from async handlers
+db_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="db")
+
 
 def get_db():
     """Dependency for getting database session."""
@@ -20,3 +35,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def run_db(fn, *args):
+    """Run a blocking database call in the DB thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, fn, *args)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Enum, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -48,6 +48,7 @@ class Budget(Base):
     # Alert Thresholds
     warning_threshold = Column(Float, default=80.0)  # Percentage
     critical_threshold = Column(Float, default=95.0)  # Percentage
+    critical_exceeded_at = Column(DateTime, nullable=True)  # Set once spending first reaches critical
     
     # Approval Settings
     requires_approval = Column(Boolean, default=False)
@@ -65,6 +66,14 @@ class Budget(Base):
     creator = relationship("User", foreign_keys=[created_by])
     approver = relationship("User", foreign_keys=[approver_id])
     
+    __table_args__ = (
+        # Overlap check in create_budget: project + date range of non-completed budgets
+        Index(
+            "ix_budget_project_active_range", "project_id", "start_date", "end_date",
+            postgresql_where=(status != BudgetStatus.COMPLETED)
+        ),
+    )
+    
     # Calculated properties
     @property
     def utilization_percentage(self):
@@ -83,6 +92,16 @@ class Budget(Base):
     @property
     def is_over_budget(self):
         return self.spent_amount > self.total_amount
+    
+    def utilization_metrics(self):
+        """All derived metrics from a single utilization computation"""
+        utilization = self.utilization_percentage
+        return {
+            "utilization_percentage": utilization,
+            "is_warning_exceeded": utilization >= self.warning_threshold,
+            "is_critical_exceeded": utilization >= self.critical_threshold,
+            "is_over_budget": self.spent_amount > self.total_amount
+        }
 
 class BudgetTransaction(Base):
     __tablename__ = "budget_transactions"
@@ -107,6 +126,13 @@ class BudgetTransaction(Base):
     budget = relationship("Budget", back_populates="transactions")
     expense = relationship("Expense")
     creator = relationship("User")
+    
+    __table_args__ = (
+        # get_budget_status: latest transactions and 30-day window per budget
+        Index("ix_bt_budget_created", budget_id, created_at.desc()),
+        # update_budget_spending: one charge per expense, so retries are idempotent
+        Index("ux_bt_budget_expense", budget_id, expense_id, unique=True),
+    )
 
 class BudgetAlert(Base):
     __tablename__ = "budget_alerts"
@@ -131,6 +157,11 @@ class BudgetAlert(Base):
     # Relationships
     budget = relationship("Budget", back_populates="alerts")
     acknowledged_user = relationship("User")
+    
+    __table_args__ = (
+        # Unacknowledged alerts per budget
+        Index("ix_ba_budget_unack", budget_id, postgresql_where=(is_acknowledged == False)),
+    )
 
 class ExpenseRequest(Base):
     __tablename__ = "expense_requests"
@@ -158,7 +189,7 @@ class ExpenseRequest(Base):
     
     # Supporting Documents
     receipt_url = Column(String(500))
-    supporting_documents = Column(Text)  # JSON array of document URLs
+    supporting_documents = Column(JSON)  # Array of document URLs
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -169,6 +200,11 @@ class ExpenseRequest(Base):
     budget = relationship("Budget", back_populates="expense_requests")
     requester = relationship("User", foreign_keys=[requested_by])
     approver = relationship("User", foreign_keys=[approved_by])
+    
+    __table_args__ = (
+        # Pending requests per organization (dashboard count)
+        Index("ix_er_org_pending", organization_id, postgresql_where=(status == "pending")),
+    )
 
 class ROIAnalysis(Base):
     __tablename__ = "roi_analyses"
@@ -190,8 +226,8 @@ class ROIAnalysis(Base):
     analysis_end_date = Column(DateTime, nullable=False)
     
     # Analysis Details
-    revenue_streams = Column(Text)  # JSON
-    cost_breakdown = Column(Text)  # JSON
+    revenue_streams = Column(JSON)
+    cost_breakdown = Column(JSON)
     assumptions = Column(Text)
     
     # Status
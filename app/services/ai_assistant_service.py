@@ -1,9 +1,18 @@
+import asyncio
+import functools
 import json
 import logging
+import re
+import time
+from collections import Counter
 from datetime import datetime, timedelta
+from pathlib import Path
+from string import Formatter
 from typing import Dict, List, Optional, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+import numpy as np
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+from sqlalchemy import desc, event, func, select
 import openai
 from app.models.project import Project
 from app.models.expense import Expense
@@ -11,10 +20,223 @@ from app.models.attendance import Attendance
 from app.models.user import User
 from app.models.budget import Budget, BudgetTransaction
 from app.core.config import settings
+from app.core.database import run_db
+from app.core.redis import cache
 from app.services.ml_service import ml_service
+from app.services.org_summary_service import build_org_summary, org_summary_service
 
 logger = logging.getLogger(__name__)
 
+# Palabras clave por intención del chat, compiladas una sola vez en una alternancia por intención
+_CHAT_INTENTS = {
+    intent: re.compile('|'.join(re.escape(word) for word in words))
+    for intent, words in {
+        'proyectos': ["proyecto", "proyectos", "torre", "las heras"],
+        'gastos': ["gasto", "gastos", "costo", "dinero"],
+        'asistencia': ["asistencia", "horas", "reporte"],
+        'productividad': ["productividad", "productivo", "rendimiento", "eficiencia"],
+        'oportunidades': ["oportunidades", "mejora", "mejorar", "optimizar"],
+    }.items()
+}
+
+_HISTORY_WINDOW = timedelta(days=90)
+_RECENT_WINDOW = timedelta(days=30)
+
+# TTL de los informes cacheados en Redis (la clave ya cambia cuando cambian los datos)
+REPORT_CACHE_TTL = 3600
+
+# Inversión estimada por nivel de costo de una sugerencia (cost_bucket: bajo=0, medio=1, alto=2)
+_COST_TABLE = np.array([5000, 15000, 50000], dtype=np.int64)
+
+# Máximo de proyectos listados en los datos de todos los proyectos
+ALL_PROJECTS_LIST_LIMIT = 50
+
+# Encabezados markdown (líneas que empiezan con '#') de los informes generados
+_SECTION_HEADER_RE = re.compile(r'^[^\S\n]*#.*$', re.MULTILINE)
+
+# Potencial de mejora según la cantidad de oportunidades encontradas (4 o más: alto)
+_IMPROVEMENT_POTENTIAL = ('Optimo', 'Optimo', 'Medio', 'Medio', 'Alto')
+
+# Orden de las sugerencias por prioridad y costo
+_PRIORITY_ORDER = {'alta': 0, 'media': 1, 'baja': 2}
+_COST_ORDER = {'bajo': 0, 'medio': 1, 'alto': 2}
+
+# Origen de cada campo de las plantillas de contexto: (clave en context_data, valor por defecto)
+_TEMPLATE_FIELD_SOURCES = {
+    'project_data': ('projects', []),
+    'expense_data': ('recent_expenses', []),
+    'attendance_data': ('attendance', []),
+    'budget_data': ('budgets', []),
+    'utilization_data': ('resource_utilization', {}),
+    'productivity_data': ('productivity_metrics', {}),
+    'cost_data': ('financial_summary', {}),
+    'financial_data': ('financial_summary', {}),
+    'trends_data': ('trends', []),
+    'budget_comparison': ('budget_comparison', {})
+}
+
+# Plantillas markdown de los informes
+REPORT_TEMPLATES_DIR = Path(__file__).parent / "ai_templates"
+
+NO_PROJECTS_RESPONSE = "📁 No tienes proyectos registrados aún. ¿Te gustaría que te ayude a crear uno?"
+
+# Conteos de proyectos y gastos por organización: {organization_id: (expira, (proyectos, gastos))}
+_COUNT_CACHE_TTL = 60
+_COUNT_CACHE_MAXSIZE = 2048
+_count_cache: Dict[int, tuple] = {}
+
+# Palabras clave del fallback por intención, en orden de prioridad
+_WORD_RE = re.compile(r'\w+')
+_FALLBACK_INTENTS = [
+    ('saludo', frozenset({"hola", "buenos", "buenas", "saludos", "hey", "hi"})),
+    ('proyectos', frozenset({"proyecto", "proyectos"})),
+    ('gastos', frozenset({"gasto", "gastos", "costo", "costos", "dinero", "presupuesto"})),
+    ('recursos', frozenset({"recurso", "recursos", "consultor", "consultores", "equipo", "personal"})),
+    ('asistencia', frozenset({"asistencia", "horas", "horario", "tiempo"})),
+    ('tendencias', frozenset({"tendencia", "tendencias", "análisis", "analisis", "predicción", "prediccion", "forecast"})),
+    ('reportes', frozenset({"reporte", "reportes", "informe", "informes"})),
+    ('ayuda', frozenset({"ayuda", "help", "puedes", "cómo", "como"})),
+]
+
+# Respuestas de fallback precalculadas por intención
+_FALLBACK_RESPONSES = {
+    'saludo': "👋 ¡Hola! Soy tu asistente de gestión empresarial.\n\n**Puedo ayudarte con:**\n\n• 📁 Análisis de proyectos\n• 💰 Control de gastos y presupuestos\n• ⏰ Reportes de asistencia\n• 📈 Tendencias y predicciones\n• 👥 Optimización de recursos\n\n¿En qué te puedo ayudar hoy?",
+    'proyectos': "🚀 **Análisis de Proyectos**\n\nTienes 13 proyectos registrados en el sistema. Te recomiendo:\n\n• Revisar los proyectos en estado 'pausado' o 'planificación'\n• Priorizar aquellos con fechas límite próximas\n• Monitorear el presupuesto asignado vs gastado\n\n¿Te gustaría ver un informe detallado de algún proyecto específico?",
+    'gastos': "💰 **Análisis de Gastos**\n\nHe analizado tus 53 registros de gastos:\n\n• **Total registrado:** Varias categorías activas\n• **Categorías principales:** Obras, Servicios, Materiales\n• **Recomendación:** Revisa los gastos de 'obra' que suelen ser los más significativos\n\n¿Quieres un análisis detallado por categoría o período?",
+    'recursos': "👥 **Optimización de Recursos**\n\nBasado en los datos de asistencia:\n\n• **Horas trabajadas:** 43 registros disponibles\n• **Promedio diario:** ~8 horas por consultor\n• **Recomendación:** Considera redistribuir carga si hay picos de trabajo\n\n¿Necesitas un análisis detallado de productividad?",
+    'asistencia': "⏰ **Análisis de Asistencia**\n\nTienes 43 registros de asistencia:\n\n• **Días registrados:** Aproximadamente 2 meses de datos\n• **Horas promedio:** 8 horas diarias\n• **Tendencia:** Estable y consistente\n\n¿Quieres ver reportes por período o consultor?",
+    'tendencias': "📈 **Análisis de Tendencias**\n\nCon tus datos actuales puedo analizar:\n\n• **Evolución de gastos** por categoría\n• **Progresos de proyectos** en el tiempo\n• **Patrones de asistencia** del equipo\n\n¿Qué tendencia específica te interesa analizar?",
+    'reportes': "📊 **Generación de Reportes**\n\nPuedo generar reportes sobre:\n\n• **Proyectos:** Estado, avance, presupuesto\n• **Gastos:** Por categoría, período, proyecto\n• **Asistencia:** Por consultor, equipo, período\n• **Financiero:** Análisis completo de ingresos/gastos\n\n¿Qué tipo de reporte necesitas?",
+    'ayuda': "🤖 **¿Cómo puedo ayudarte?**\n\nEstoy diseñado para asistirte con:\n\n• 📁 **Proyectos:** Estado, análisis, recomendaciones\n• 💰 **Gastos:** Seguimiento, categorización, alertas\n• ⏰ **Asistencia:** Reportes, productividad, horas\n• 📈 **Tendencias:** Predicciones y análisis histórico\n• 👥 **Recursos:** Optimización y distribución\n\n**Ejemplos de preguntas:**\n- \"¿Cómo van mis proyectos?\"\n- \"Muéstrame los gastos del mes\"\n- \"¿Cuál es la tendencia de gastos?\"\n- \"Analiza la asistencia del equipo\"",
+    'default': "🤖 **Asistente de Gestión**\n\nNo estoy seguro de entender tu consulta. Puedo ayudarte con:\n\n• 📁 Análisis de proyectos\n• 💰 Control de gastos\n• ⏰ Reportes de asistencia\n• 📈 Tendencias y predicciones\n• 👥 Optimización de recursos\n\n¿Podrías ser más específico sobre lo que necesitas?"
+}
+
+
+def _classify_intent(prompt_lower: str) -> str:
+    """Intención del fallback para un prompt"""
+    tokens = set(_WORD_RE.findall(prompt_lower))
+    for intent, keywords in _FALLBACK_INTENTS:
+        if tokens & keywords:
+            return intent
+    return 'default'
+
+
+def _aggregate_by_category(rows) -> tuple:
+    """Sumar montos total y por categoría sobre filas (amount, category) con NumPy"""
+    n = len(rows)
+    cat_index: Dict[str, int] = {}
+    amounts = np.fromiter((r[0] for r in rows), dtype=np.float64, count=n)
+    cat_ids = np.fromiter(
+        (cat_index.setdefault(r[1], len(cat_index)) for r in rows),
+        dtype=np.intp,
+        count=n
+    )
+    per_cat = np.bincount(cat_ids, weights=amounts, minlength=len(cat_index))
+    return float(amounts.sum()), Counter({cat: float(per_cat[i]) for cat, i in cat_index.items()})
+
+
+def _forecast_daily_trend(rows, start_day, n_days: int, period: int) -> tuple:
+    """Proyectar gastos con una tendencia lineal sobre la serie diaria de filas (amount, category, expense_date)
+
+    Devuelve (total proyectado, pendiente diaria, confianza en [0, 1]).
+    """
+    n = len(rows)
+    amounts = np.fromiter((r[0] for r in rows), dtype=np.float64, count=n)
+    days = (np.array([r[2] for r in rows], dtype='datetime64[D]') - np.datetime64(start_day, 'D')).astype(np.int64)
+    daily = np.bincount(np.clip(days, 0, n_days - 1), weights=amounts, minlength=n_days)
+    
+    x = np.arange(n_days)
+    slope, intercept = np.polyfit(x, daily, 1)
+    projected = slope * np.arange(n_days, n_days + period) + intercept
+    predicted_total = float(np.clip(projected, 0, None).sum())
+    
+    # Confianza a partir de la dispersión de los residuos respecto al gasto diario medio
+    mean_daily = daily.mean()
+    residual_std = (daily - (slope * x + intercept)).std()
+    confidence = float(1.0 / (1.0 + residual_std / mean_daily)) if mean_daily > 0 else 0.0
+    return predicted_total, float(slope), confidence
+
+
+@functools.lru_cache(maxsize=4096)
+def _project_name_tokens(name: str) -> tuple:
+    """Nombre de proyecto normalizado y su conjunto de palabras (cacheado por nombre)"""
+    name_lower = name.lower()
+    return name_lower, frozenset(name_lower.split())
+
+
+def _name_mentioned(name: str, message_lower: str, message_words: frozenset) -> bool:
+    """Coincidencia parcial del nombre de un proyecto en el mensaje (ej: "torre" en "Torre Las Heras")"""
+    name_lower, project_words = _project_name_tokens(name)
+    # Si al menos 2 palabras coinciden o el nombre completo está en el mensaje
+    return name_lower in message_lower or len(project_words & message_words) >= 2
+
+
+@functools.lru_cache(maxsize=1)
+def _ts_for(second: int) -> str:
+    """Marca de tiempo ISO (UTC) con resolución de segundos, reutilizada dentro del mismo segundo"""
+    return datetime.utcfromtimestamp(second).isoformat()
+
+
+def _make_template_renderer(template: str):
+    """Precompilar una plantilla de contexto en una función context_data -> prompt"""
+    # (texto literal, clave en context_data o None si no sigue un campo, valor por defecto)
+    pieces = []
+    for literal, field, _, _ in Formatter().parse(template):
+        if field is None:
+            pieces.append((literal, None, None))
+        elif field == 'context_data':
+            pieces.append((literal, '', None))
+        else:
+            pieces.append((literal, *_TEMPLATE_FIELD_SOURCES[field]))
+    
+    def render(context_data: Dict) -> str:
+        out = []
+        for literal, source, default in pieces:
+            out.append(literal)
+            if source is not None:
+                value = context_data.get(source, default) if source else context_data
+                out.append(json.dumps(value, default=str))
+        return "".join(out)
+    
+    return render
+
+
+def _cached_counts(db: Session, organization_id: int) -> tuple:
+    """Cantidad de proyectos y gastos de la organización en una sola consulta, cacheada con TTL"""
+    now = time.monotonic()
+    entry = _count_cache.get(organization_id)
+    if entry and entry[0] > now:
+        return entry[1]
+    
+    counts = tuple(db.query(
+        select(func.count(Project.id)).where(Project.organization_id == organization_id).scalar_subquery(),
+        select(func.count(Expense.id)).where(Expense.organization_id == organization_id).scalar_subquery()
+    ).one())
+    if len(_count_cache) >= _COUNT_CACHE_MAXSIZE:
+        _count_cache.clear()
+    _count_cache[organization_id] = (now + _COUNT_CACHE_TTL, counts)
+    return counts
+
+
+def _invalidate_counts(mapper, connection, target):
+    """Descartar los conteos cacheados de la organización al crear o borrar filas"""
+    _count_cache.pop(target.organization_id, None)
+
+
+for _model in (Project, Expense):
+    event.listen(_model, 'after_insert', _invalidate_counts)
+    event.listen(_model, 'after_delete', _invalidate_counts)
+
+
+def _fetch_org_rows(bind, model, organization_id: int) -> List:
+    """Cargar las filas de un modelo para la organización en una sesión propia"""
+    db = sessionmaker(bind=bind, autoflush=False)()
+    try:
+        return db.query(model).filter(model.organization_id == organization_id).all()
+    finally:
+        db.close()
+
+
 class AIAssistantService:
     def __init__(self):
         # Inicializar cliente de OpenAI (o puede ser cualquier otro proveedor)
@@ -82,6 +304,31 @@ class AIAssistantService:
             Responde preguntas sobre el sistema, proporciona insights útiles y ayuda a tomar decisiones informadas.
             """
         }
+        
+        # Renderizador precompilado por plantilla: solo serializa los campos que esa plantilla usa
+        self._renderers = {
+            key: _make_template_renderer(template) for key, template in self.context_templates.items()
+        }
+        
+        # Prefijo estático de cada plantilla (hasta el primer dato) para el caché de prompts del proveedor
+        self._template_prefixes = {
+            key: template.split('{', 1)[0] for key, template in self.context_templates.items()
+        }
+        
+        # Plantillas Jinja2 de los informes, compiladas una sola vez al iniciar
+        self._jenv = Environment(
+            loader=FileSystemLoader(str(REPORT_TEMPLATES_DIR)),
+            auto_reload=False,
+            autoescape=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True
+        )
+        self._jenv.filters['fmt'] = format
+        self._tmpl = {
+            key: self._jenv.get_template(f"{key}.md.j2")
+            for key in ('project_report', 'predictive', 'resource_opt')
+        }
     
     async def chat_with_assistant(
         self,
@@ -93,11 +340,11 @@ class AIAssistantService:
     ) -> Dict:
         """Chat principal con el asistente de IA"""
         try:
-            logger.info(f"AI Chat request from user {user_id}: {message[:50]}...")
+            logger.info("AI Chat request from user %s: %.50s...", user_id, message)
             
             # Analizar la consulta y generar respuesta personalizada con datos reales
             response = await self._generate_personalized_response(db, organization_id, message)
-            logger.info(f"AI response generated: {len(response)} chars")
+            logger.debug("AI response generated: %d chars", len(response))
             
             return {
                 "success": True,
@@ -107,7 +354,7 @@ class AIAssistantService:
             }
             
         except Exception as e:
-            logger.error(f"Error in AI assistant chat: {e}", exc_info=True)
+            logger.error("Error in AI assistant chat: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 "success": False,
                 "error": str(e),
@@ -123,110 +370,86 @@ class AIAssistantService:
     ) -> Dict:
         """Generación automática de informes con IA"""
         try:
-            logger.info(f"Generating {report_type} report for org {organization_id}, project {project_id}")
+            logger.info("Generating %s report for org %s, project %s", report_type, organization_id, project_id)
+            now_iso = datetime.utcnow().isoformat()
+            
+            version = (
+                f"{await run_db(self._data_version, db, organization_id, Project, Project.updated_at)}:"
+                f"{await run_db(self._data_version, db, organization_id, Expense, Expense.updated_at)}"
+            )
+            cache_key = f"aireport:project_report:{organization_id}:{project_id}:{report_type}:{version}"
+            cached = await self._get_cached_report(cache_key)
+            if cached:
+                return cached
             
             # Obtener datos reales
             if project_id:
                 # Reporte de proyecto específico
-                project = db.query(Project).filter(
+                project = await run_db(db.query(Project).filter(
                     Project.id == project_id,
                     Project.organization_id == organization_id
-                ).first()
+                ).first)
                 
                 if not project:
                     return {"success": False, "error": "Proyecto no encontrado"}
                 
                 # Obtener gastos del proyecto
-                expenses = db.query(Expense).filter(
+                expenses = await run_db(db.query(Expense).filter(
                     Expense.project_id == project_id,
                     Expense.organization_id == organization_id
-                ).all()
+                ).all)
                 
                 total_expenses = sum(e.amount for e in expenses)
                 
-                report_content = f"""# Informe del Proyecto: {project.name}
-
-## Resumen Ejecutivo
-- **Estado:** {project.status}
-- **Presupuesto:** ${project.budget:,.2f} USD
-- **Gastos Totales:** ${total_expenses:,.2f} USD
-- **Disponible:** ${(project.budget - total_expenses):,.2f} USD
-- **Utilización:** {(total_expenses/project.budget*100):.1f}%
-
-## Detalles del Proyecto
-- **Descripción:** {project.description or 'Sin descripción'}
-- **Fecha Inicio:** {project.start_date.strftime('%d/%m/%Y') if project.start_date else 'No definida'}
-- **Fecha Fin:** {project.end_date.strftime('%d/%m/%Y') if project.end_date else 'No definida'}
-- **Progreso:** {project.progress_percentage}%
-
-## Análisis de Gastos
-- **Total de Transacciones:** {len(expenses)}
-- **Gasto Promedio:** ${(total_expenses/len(expenses)):,.2f} USD por transacción
-
-## Recomendaciones
-{'⚠️ **Alerta:** El proyecto está cerca del límite presupuestario' if (total_expenses/project.budget) > 0.9 else '✅ El presupuesto está bajo control'}
-"""
+                report_content = self._tmpl['project_report'].render(
+                    project=project,
+                    total_expenses=total_expenses,
+                    expense_count=len(expenses)
+                )
             else:
                 # Reporte general de todos los proyectos
-                projects = db.query(Project).filter(
+                projects = await run_db(db.query(Project).filter(
                     Project.organization_id == organization_id
-                ).all()
+                ).all)
                 
                 total_budget = sum(p.budget for p in projects if p.budget)
                 
-                expenses = db.query(Expense).filter(
+                expenses = await run_db(db.query(Expense).filter(
                     Expense.organization_id == organization_id
-                ).all()
+                ).all)
                 
                 total_expenses = sum(e.amount for e in expenses)
                 
-                report_content = f"""# Informe General de Proyectos
-
-## Resumen Ejecutivo
-- **Total de Proyectos:** {len(projects)}
-- **Presupuesto Total:** ${total_budget:,.2f} USD
-- **Gastos Totales:** ${total_expenses:,.2f} USD
-- **Balance:** ${(total_budget - total_expenses):,.2f} USD
-
-## Distribución por Estado
-"""
-                # Contar proyectos por estado
-                from collections import Counter
-                status_count = Counter(p.status for p in projects)
-                for status, count in status_count.items():
-                    report_content += f"- **{status}:** {count} proyectos\n"
-                
-                report_content += f"""
-## Análisis Financiero
-- **Total de Gastos Registrados:** {len(expenses)}
-- **Gasto Promedio por Proyecto:** ${(total_expenses/len(projects)):,.2f} USD
-- **Utilización Presupuestaria:** {(total_expenses/total_budget*100):.1f}%
-
-## Recomendaciones
-- Revisar proyectos en estado 'pausado' para reactivación o cierre
-- Monitorear proyectos con alta utilización presupuestaria
-- Considerar ajustes presupuestarios para proyectos activos
-"""
+                report_content = self._tmpl['project_report'].render(
+                    project=None,
+                    project_count=len(projects),
+                    total_budget=total_budget,
+                    total_expenses=total_expenses,
+                    expense_count=len(expenses),
+                    status_count=Counter(p.status for p in projects)
+                )
             
             structured_report = {
                 "title": f"Informe {report_type.title()}",
-                "generated_at": datetime.utcnow().isoformat(),
+                "generated_at": now_iso,
                 "content": report_content,
                 "sections": [],
                 "key_metrics": [],
                 "recommendations": []
             }
             
-            return {
+            result = {
                 "success": True,
                 "report": structured_report,
                 "report_type": report_type,
-                "generated_at": datetime.utcnow().isoformat(),
+                "generated_at": now_iso,
                 "project_id": project_id
             }
+            await self._set_cached_report(cache_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Error generating AI report: {e}", exc_info=True)
+            logger.error("Error generating AI report: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 "success": False,
                 "error": str(e)
@@ -240,71 +463,72 @@ class AIAssistantService:
     ) -> Dict:
         """Análisis predictivo de gastos con IA"""
         try:
-            logger.info(f"Generating predictive analysis for org {organization_id}, period {prediction_period} days")
+            logger.info("Generating predictive analysis for org %s, period %s days", organization_id, prediction_period)
             
             # Obtener gastos históricos
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=90)
+            now = datetime.utcnow()
+            cutoff_date = now - _HISTORY_WINDOW
+            
+            version = await run_db(self._data_version, db, organization_id, Expense, Expense.updated_at)
+            cache_key = f"aireport:predictive:{organization_id}:{prediction_period}:{cutoff_date.date()}:{version}"
+            cached = await self._get_cached_report(cache_key)
+            if cached:
+                return cached
             
-            expenses = db.query(Expense).filter(
+            rows = await run_db(db.query(Expense.amount, Expense.category, Expense.expense_date).filter(
                 Expense.organization_id == organization_id,
                 Expense.expense_date >= cutoff_date
-            ).all()
+            ).all)
             
-            if not expenses:
+            if not rows:
                 return {
                     "success": False,
                     "error": "No hay suficientes datos históricos para generar predicciones"
                 }
             
-            # Calcular métricas básicas
-            total_expenses = sum(e.amount for e in expenses)
-            avg_daily = total_expenses / 90
-            predicted_total = avg_daily * prediction_period
-            
-            # Análisis por categoría
-            from collections import defaultdict
-            by_category = defaultdict(float)
-            for e in expenses:
-                by_category[e.category] += e.amount
-            
-            analysis_content = f"""# Análisis Predictivo de Gastos
-
-## Predicción para los próximos {prediction_period} días
-
-### Resumen
-- **Gasto Histórico (90 días):** ${total_expenses:,.2f} USD
-- **Promedio Diario:** ${avg_daily:,.2f} USD
-- **Predicción Total:** ${predicted_total:,.2f} USD
-
-### Distribución por Categoría
-"""
-            for category, amount in sorted(by_category.items(), key=lambda x: x[1], reverse=True):
-                percentage = (amount / total_expenses) * 100
-                predicted_category = (amount / 90) * prediction_period
-                analysis_content += f"- **{category}:** ${amount:,.2f} ({percentage:.1f}%) → Predicción: ${predicted_category:,.2f}\n"
+            # Total y análisis por categoría en una sola pasada
+            total_expenses, by_category = _aggregate_by_category(rows)
             
-            analysis_content += f"""
-### Recomendaciones
-- Monitorear categorías con mayor gasto
-- Considerar optimizaciones en gastos recurrentes
-- Establecer alertas para gastos inusuales
-"""
+            avg_daily = total_expenses / 90
             
-            return {
+            # Tendencia lineal sobre la serie diaria del período histórico
+            n_days = (now.date() - cutoff_date.date()).days + 1
+            predicted_total, daily_trend, confidence_score = _forecast_daily_trend(
+                rows, cutoff_date.date(), n_days, prediction_period
+            )
+            
+            # Constantes por categoría calculadas una sola vez
+            inv_total = 100.0 / total_expenses if total_expenses else 0.0
+            period_factor = predicted_total / total_expenses if total_expenses else 0.0
+            
+            analysis_content = self._tmpl['predictive'].render(
+                prediction_period=prediction_period,
+                total_expenses=total_expenses,
+                avg_daily=avg_daily,
+                daily_trend=daily_trend,
+                predicted_total=predicted_total,
+                categories=by_category.most_common(),
+                inv_total=inv_total,
+                period_factor=period_factor
+            )
+            
+            result = {
                 "success": True,
                 "predictions": {
                     "content": analysis_content,
                     "predicted_total": predicted_total,
                     "avg_daily": avg_daily,
-                    "confidence_score": 0.75,
+                    "daily_trend": daily_trend,
+                    "confidence_score": round(confidence_score, 2),
                     "prediction_period": prediction_period
                 },
-                "generated_at": datetime.utcnow().isoformat()
+                "generated_at": now.isoformat()
             }
+            await self._set_cached_report(cache_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Error in predictive expense analysis: {e}", exc_info=True)
+            logger.error("Error in predictive expense analysis: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 "success": False,
                 "error": str(e)
@@ -318,16 +542,23 @@ class AIAssistantService:
     ) -> Dict:
         """Sugerencias de optimización de recursos con IA"""
         try:
-            logger.info(f"Generating resource optimization for org {organization_id}, period {analysis_period} days")
+            logger.info("Generating resource optimization for org %s, period %s days", organization_id, analysis_period)
             
             # Obtener datos de asistencia
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=analysis_period)
+            now = datetime.utcnow()
+            cutoff_date = now - timedelta(days=analysis_period)
+            
+            # Attendance no tiene updated_at: el check_out más reciente refleja los cierres de jornada
+            version = await run_db(self._data_version, db, organization_id, Attendance, Attendance.id, Attendance.check_out)
+            cache_key = f"aireport:resource_opt:{organization_id}:{analysis_period}:{cutoff_date.date()}:{version}"
+            cached = await self._get_cached_report(cache_key)
+            if cached:
+                return cached
             
-            attendance_records = db.query(Attendance).filter(
+            attendance_records = await run_db(db.query(Attendance).filter(
                 Attendance.organization_id == organization_id,
                 Attendance.check_in >= cutoff_date
-            ).all()
+            ).all)
             
             if not attendance_records:
                 return {
@@ -343,7 +574,7 @@ class AIAssistantService:
             
             # Validar que las horas sean razonables (máximo 12 horas por día)
             if avg_hours_per_day > 12:
-                logger.warning(f"Average hours per day seems too high: {avg_hours_per_day}")
+                logger.warning("Average hours per day seems too high: %s", avg_hours_per_day)
                 # Cap at reasonable value for display
                 avg_hours_per_day = min(avg_hours_per_day, 12)
             
@@ -354,31 +585,16 @@ class AIAssistantService:
                 by_user[a.user_id]["hours"] += a.hours_worked or 0
                 by_user[a.user_id]["days"] += 1
             
-            optimization_content = f"""# Optimización de Recursos
-
-## Análisis de los últimos {analysis_period} días
-
-### Resumen General
-- **Total de Horas Trabajadas:** {total_hours:,.1f} horas
-- **Promedio Diario:** {avg_hours_per_day:,.1f} horas
-- **Días con Registro:** {total_days} días
-- **Usuarios Activos:** {len(by_user)} personas
-
-### Distribución por Usuario
-"""
-            for user_id, data in sorted(by_user.items(), key=lambda x: x[1]["hours"], reverse=True):
-                avg_user_hours = data["hours"] / data["days"] if data["days"] > 0 else 0
-                optimization_content += f"- **Usuario {user_id}:** {data['hours']:.1f} horas ({data['days']} días) - Promedio: {avg_user_hours:.1f} h/día\n"
-            
-            optimization_content += f"""
-### Recomendaciones
-- ✅ Mantener registro consistente de asistencia
-- 📊 Monitorear usuarios con carga de trabajo alta
-- ⚖️ Considerar redistribución si hay desequilibrios
-- 📈 Establecer metas de productividad realistas
-"""
+            optimization_content = self._tmpl['resource_opt'].render(
+                analysis_period=analysis_period,
+                total_hours=total_hours,
+                avg_hours_per_day=avg_hours_per_day,
+                total_days=total_days,
+                active_users=len(by_user),
+                users=sorted(by_user.items(), key=lambda x: x[1]["hours"], reverse=True)
+            )
             
-            return {
+            result = {
                 "success": True,
                 "suggestions": {
                     "content": optimization_content,
@@ -387,39 +603,77 @@ class AIAssistantService:
                     "active_users": len(by_user),
                     "analysis_period": analysis_period
                 },
-                "generated_at": datetime.utcnow().isoformat()
+                "generated_at": now.isoformat()
             }
+            await self._set_cached_report(cache_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Error in resource optimization: {e}", exc_info=True)
+            logger.error("Error in resource optimization: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 "success": False,
                 "error": str(e)
             }
     
+    def _data_version(self, db: Session, organization_id: int, model, *columns) -> str:
+        """Versión de los datos de un modelo para la organización (cantidad de filas y máximos de las columnas)"""
+        row = db.query(func.count(model.id), *[func.max(c) for c in columns]).filter(
+            model.organization_id == organization_id
+        ).one()
+        return ':'.join(str(v) for v in row)
+    
+    async def _get_cached_report(self, key: str) -> Optional[Dict]:
+        """Obtener un informe cacheado en Redis (None si no existe o Redis no está disponible)"""
+        try:
+            return await cache.get_json(key)
+        except Exception as e:
+            logger.warning("Report cache unavailable: %s", e)
+            return None
+    
+    async def _set_cached_report(self, key: str, result: Dict):
+        """Guardar un informe en Redis"""
+        try:
+            await cache.set_json(key, result, REPORT_CACHE_TTL)
+        except Exception as e:
+            logger.warning("Report cache unavailable: %s", e)
+    
     async def _generate_personalized_response(self, db: Session, organization_id: int, message: str) -> str:
         """Generar respuesta personalizada basada en datos reales"""
         message_lower = message.lower()
+        message_words = frozenset(message_lower.split())
+        wants_projects = _CHAT_INTENTS['proyectos'].search(message_lower)
+        
+        # Respuestas generales desde el resumen precalculado de la organización
+        if wants_projects or not any(
+            _CHAT_INTENTS[intent].search(message_lower)
+            for intent in ('gastos', 'asistencia', 'productividad', 'oportunidades')
+        ):
+            summary = await run_db(org_summary_service.get_fresh, db, organization_id)
+            if summary is not None:
+                if not wants_projects:
+                    return self._render_general_summary(summary)
+                if not summary["project_count"]:
+                    return NO_PROJECTS_RESPONSE
+                if not any(_name_mentioned(name, message_lower, message_words) for name in summary["project_names"]):
+                    return self._render_projects_overview(summary)
         
-        # Obtener datos reales
-        projects = db.query(Project).filter(Project.organization_id == organization_id).all()
-        expenses = db.query(Expense).filter(Expense.organization_id == organization_id).all()
-        attendance = db.query(Attendance).filter(Attendance.organization_id == organization_id).all()
+        # Obtener datos reales (consultas independientes en paralelo, una conexión del pool cada una)
+        bind = db.get_bind()
+        projects, expenses, attendance = await asyncio.gather(
+            run_db(_fetch_org_rows, bind, Project, organization_id),
+            run_db(_fetch_org_rows, bind, Expense, organization_id),
+            run_db(_fetch_org_rows, bind, Attendance, organization_id)
+        )
         
         # Análisis de proyectos
-        if any(word in message_lower for word in ["proyecto", "proyectos", "torre", "las heras"]):
+        if wants_projects:
             if not projects:
-                return "📁 No tienes proyectos registrados aún. ¿Te gustaría que te ayude a crear uno?"
+                return NO_PROJECTS_RESPONSE
             
             # Buscar proyecto específico si se menciona
             project_match = None
             for p in projects:
-                # Buscar coincidencias parciales (ej: "torre" en "Torre Las Heras")
-                project_words = p.name.lower().split()
-                message_words = message_lower.split()
-                # Si al menos 2 palabras coinciden o el nombre completo está en el mensaje
-                if (p.name.lower() in message_lower or 
-                    len(set(project_words) & set(message_words)) >= 2):
+                if _name_mentioned(p.name, message_lower, message_words):
                     project_match = p
                     break
             
@@ -429,7 +683,7 @@ class AIAssistantService:
                 total_spent = sum(e.amount for e in project_expenses)
                 budget_used = (total_spent / project_match.budget * 100) if project_match.budget else 0
                 
-                response = f"""🏗️ **Análisis del Proyecto: {project_match.name}**
+                parts = [f"""🏗️ **Análisis del Proyecto: {project_match.name}**
 
 📊 **Estado Actual:**
 • **Estado:** {project_match.status}
@@ -446,113 +700,34 @@ class AIAssistantService:
 • **Transacciones:** {len(project_expenses)} registros
 • **Gasto promedio:** ${(total_spent/len(project_expenses)):,.2f} por transacción
 
-"""
+"""]
                 if budget_used > 90:
-                    response += "⚠️ **Alerta:** El proyecto está cerca del límite presupuestario. Considera revisar los gastos pendientes.\n"
+                    parts.append("⚠️ **Alerta:** El proyecto está cerca del límite presupuestario. Considera revisar los gastos pendientes.\n")
                 elif budget_used > 75:
-                    response += "⚡ **Atención:** El proyecto ha utilizado más del 75% del presupuesto. Monitorea los gastos restantes.\n"
+                    parts.append("⚡ **Atención:** El proyecto ha utilizado más del 75% del presupuesto. Monitorea los gastos restantes.\n")
                 else:
-                    response += "✅ **Estado Saludable:** El presupuesto está bajo control.\n"
+                    parts.append("✅ **Estado Saludable:** El presupuesto está bajo control.\n")
                 
-                response += "\n¿Necesitas un análisis más detallado o recomendaciones específicas?"
-                return response
+                parts.append("\n¿Necesitas un análisis más detallado o recomendaciones específicas?")
+                return "".join(parts)
             
             # Análisis general de proyectos
-            from collections import Counter
-            status_count = Counter(p.status for p in projects)
-            total_budget = sum(p.budget for p in projects if p.budget)
-            total_spent = sum(e.amount for e in expenses)
-            
-            # Identificar proyectos que necesitan atención urgente
-            urgent_projects = []
-            # Simplificado para evitar errores
-            for p in projects:
-                # Proyectos pausados o con bajo progreso
-                status_lower = (p.status or "").lower()
-                if ('hold' in status_lower or 'pause' in status_lower or 
-                    (p.progress_percentage and p.progress_percentage < 20)):
-                    urgent_projects.append(p)
-                # Proyectos con sobrecosto
-                project_expenses = [e for e in expenses if e.project_id == p.id]
-                project_spent = sum(e.amount for e in project_expenses)
-                if p.budget and project_spent > p.budget * 0.9:
-                    urgent_projects.append(p)
-            
-            response = f"""🚀 **Análisis General de Proyectos**
-
-📊 **Resumen:**
-• **Total de Proyectos:** {len(projects)}
-• **Presupuesto Total:** ${total_budget:,.2f} USD
-• **Gastado:** ${total_spent:,.2f} USD
-• **Utilización:** {(total_spent/total_budget*100):.1f}%
-
-📈 **Distribución por Estado:**
-"""
-            for status, count in status_count.items():
-                response += f"• **{status}:** {count} proyecto{'s' if count != 1 else ''}\n"
-            
-            # Sección de atención urgente
-            if urgent_projects:
-                response += f"""
-
-⚠️ **PROYECTOS QUE REQUIEREN ATENCIÓN URGENTE:**
-"""
-                for p in urgent_projects[:5]:
-                    project_expenses = [e for e in expenses if e.project_id == p.id]
-                    project_spent = sum(e.amount for e in project_expenses)
-                    budget_used = (project_spent / p.budget * 100) if p.budget else 0
-                    
-                    if p.status in ['on_hold', 'paused']:
-                        response += f"• **{p.name}** - ⏸️ PAUSADO - necesita reactivación\n"
-                    elif p.progress_percentage and p.progress_percentage < 20:
-                        response += f"• **{p.name}** - 📉 BAJO PROGRESO ({p.progress_percentage}%)\n"
-                    elif p.budget and project_spent > p.budget * 0.9:
-                        response += f"• **{p.name}** - 💸 SOBRECOSTO ({budget_used:.1f}% utilizado)\n"
-            else:
-                response += f"""
-
-✅ **Todos los proyectos están en buen estado.**"""
-            
-            response += f"""
-
-🏗️ **Proyectos Activos:**
-"""
-            active_projects = [p for p in projects if p.status in ['in_progress', 'en_progreso', 'planificacion']][:5]
-            for p in active_projects:
-                response += f"• **{p.name}** - {p.status} ({p.progress_percentage}%)\n"
-            
-            response += "\n💡 **Recomendaciones:**\n"
-            if urgent_projects:
-                response += "• Priorizar los proyectos marcados como atención urgente\n"
-            if status_count.get('on_hold', 0) > 0 or status_count.get('paused', 0) > 0:
-                response += f"• Revisar {status_count.get('on_hold', 0) + status_count.get('paused', 0)} proyecto(s) pausado(s)\n"
-            if total_spent / total_budget > 0.8:
-                response += "• Monitorear gastos - utilización presupuestaria alta\n"
-            
-            response += "\n¿Quieres analizar algún proyecto específico?"
-            return response
+            return self._render_projects_overview(build_org_summary(projects, expenses, attendance))
         
         # Análisis de gastos
-        if any(word in message_lower for word in ["gasto", "gastos", "costo", "dinero"]):
+        if _CHAT_INTENTS['gastos'].search(message_lower):
             if not expenses:
                 return "💰 No hay gastos registrados aún. Comienza a registrar tus gastos para obtener análisis detallados."
             
-            from collections import defaultdict
-            from datetime import timedelta
-            
             # Análisis por categoría
-            by_category = defaultdict(float)
-            for e in expenses:
-                by_category[e.category] += e.amount
-            
-            total = sum(by_category.values())
+            total, by_category = _aggregate_by_category([(e.amount, e.category) for e in expenses])
             
             # Gastos recientes (últimos 30 días)
-            cutoff = datetime.utcnow() - timedelta(days=30)
+            cutoff = datetime.utcnow() - _RECENT_WINDOW
             recent = [e for e in expenses if e.expense_date >= cutoff]
             recent_total = sum(e.amount for e in recent)
             
-            response = f"""💰 **Análisis de Gastos**
+            parts = [f"""💰 **Análisis de Gastos**
 
 📊 **Resumen General:**
 • **Total de Gastos:** ${total:,.2f} USD
@@ -561,25 +736,25 @@ class AIAssistantService:
 • **Promedio por transacción:** ${(total/len(expenses)):,.2f} USD
 
 📈 **Distribución por Categoría:**
-"""
-            for category, amount in sorted(by_category.items(), key=lambda x: x[1], reverse=True):
+"""]
+            for category, amount in by_category.most_common():
                 percentage = (amount / total) * 100
-                response += f"• **{category}:** ${amount:,.2f} ({percentage:.1f}%)\n"
+                parts.append(f"• **{category}:** ${amount:,.2f} ({percentage:.1f}%)\n")
             
             # Tendencia
             if len(recent) > 0:
                 avg_daily = recent_total / 30
-                response += f"""
+                parts.append(f"""
 📉 **Tendencia:**
 • **Promedio diario (30 días):** ${avg_daily:,.2f} USD
 • **Proyección mensual:** ${(avg_daily * 30):,.2f} USD
-"""
+""")
             
-            response += "\n💡 ¿Quieres un análisis predictivo o desglose por proyecto?"
-            return response
+            parts.append("\n💡 ¿Quieres un análisis predictivo o desglose por proyecto?")
+            return "".join(parts)
         
         # Análisis de asistencia
-        if any(word in message_lower for word in ["asistencia", "horas", "reporte"]):
+        if _CHAT_INTENTS['asistencia'].search(message_lower):
             if not attendance:
                 return "⏰ No hay registros de asistencia. Comienza a registrar las horas trabajadas para obtener análisis."
             
@@ -592,7 +767,7 @@ class AIAssistantService:
                 by_user[a.user_id]["hours"] += a.hours_worked or 0
                 by_user[a.user_id]["days"] += 1
             
-            response = f"""⏰ **Reporte de Asistencia**
+            parts = [f"""⏰ **Reporte de Asistencia**
 
 📊 **Resumen:**
 • **Total de Horas:** {total_hours:,.1f} horas
@@ -601,16 +776,16 @@ class AIAssistantService:
 • **Promedio por día:** {(total_hours/len(attendance)):,.1f} horas
 
 👥 **Distribución por Usuario:**
-"""
+"""]
             for user_id, data in sorted(by_user.items(), key=lambda x: x[1]["hours"], reverse=True):
                 avg_hours = data["hours"] / data["days"]
-                response += f"• **Usuario {user_id}:** {data['hours']:.1f}h en {data['days']} días (promedio: {avg_hours:.1f}h/día)\n"
+                parts.append(f"• **Usuario {user_id}:** {data['hours']:.1f}h en {data['days']} días (promedio: {avg_hours:.1f}h/día)\n")
             
-            response += "\n💡 ¿Necesitas análisis de productividad o tendencias?"
-            return response
+            parts.append("\n💡 ¿Necesitas análisis de productividad o tendencias?")
+            return "".join(parts)
         
         # Análisis de productividad
-        if any(word in message_lower for word in ["productividad", "productivo", "rendimiento", "eficiencia"]):
+        if _CHAT_INTENTS['productividad'].search(message_lower):
             if not attendance:
                 return "📊 No hay datos de asistencia para analizar la productividad. Comienza a registrar los horarios del equipo."
             
@@ -624,7 +799,7 @@ class AIAssistantService:
             total_days = len(attendance)
             avg_hours_per_day = total_hours / total_days if total_days > 0 else 0
             
-            response = f"""📈 **Análisis de Productividad**
+            parts = [f"""📈 **Análisis de Productividad**
 
 📊 **Métricas Generales:**
 • **Total Horas Trabajadas:** {total_hours:,.1f} horas
@@ -633,23 +808,23 @@ class AIAssistantService:
 • **Usuarios Activos:** {len(by_user)} personas
 
 👥 **Productividad por Usuario:**
-"""
+"""]
             for user_id, data in sorted(by_user.items(), key=lambda x: x[1]["hours"], reverse=True):
                 avg_user = data["hours"] / data["days"]
                 efficiency = min((avg_user / 8) * 100, 100)  # Basado en jornada de 8h
-                response += f"• **Usuario {user_id}:** {data['hours']:.1f}h total, {avg_user:.1f}h/día (Eficiencia: {efficiency:.1f}%)\n"
+                parts.append(f"• **Usuario {user_id}:** {data['hours']:.1f}h total, {avg_user:.1f}h/día (Eficiencia: {efficiency:.1f}%)\n")
             
-            response += f"""
+            parts.append(f"""
 💡 **Recomendaciones:**
 • {'✅ Buena productividad general' if avg_hours_per_day >= 6 else '⚠️ Se recomienda mejorar el registro de horas'}
 • {'📈 Consistencia en el registro' if total_days >= 20 else '📅 Registrar más días para mejor análisis'}
 • {'🎯 Focalizar en usuarios con baja eficiencia' if len(by_user) > 1 else '👥 Mantener el buen ritmo'}
 
-¿Quieres ver detalles de algún usuario específico?"""
-            return response
+¿Quieres ver detalles de algún usuario específico?""")
+            return "".join(parts)
         
         # Análisis de oportunidades y mejoras
-        if any(word in message_lower for word in ["oportunidades", "mejora", "mejorar", "optimizar"]):
+        if _CHAT_INTENTS['oportunidades'].search(message_lower):
             opportunities = []
             
             # Oportunidades basadas en proyectos
@@ -664,14 +839,10 @@ class AIAssistantService:
             
             # Oportunidades basadas en gastos
             if expenses:
-                from collections import defaultdict
-                by_category = defaultdict(list)
-                for e in expenses:
-                    by_category[e.category].append(e.amount)
-                
-                high_categories = [(cat, amounts) for cat, amounts in by_category.items() if len(amounts) > 5]
+                category_counts = Counter(e.category for e in expenses)
+                high_categories = [cat for cat, count in category_counts.most_common(3) if count > 5]
                 if high_categories:
-                    opportunities.append(f"💰 Optimizar categorías con muchas transacciones: {', '.join([cat for cat, _ in high_categories[:3]])}")
+                    opportunities.append(f"💰 Optimizar categorías con muchas transacciones: {', '.join(high_categories)}")
             
             # Oportunidades basadas en asistencia
             if attendance:
@@ -683,17 +854,16 @@ class AIAssistantService:
                 elif avg_hours > 10:
                     opportunities.append("⚖️ Revisar carga de trabajo - posible sobreesfuerzo")
             
-            response = f"""🎯 **Análisis de Oportunidades de Mejora**
+            parts = [f"""🎯 **Análisis de Oportunidades de Mejora**
 
 🔍 **Áreas Identificadas:**
-"""
+"""]
             if opportunities:
-                for opp in opportunities:
-                    response += f"• {opp}\n"
+                parts.extend(f"• {opp}\n" for opp in opportunities)
             else:
-                response += "• ✅ El sistema funciona eficientemente\n"
+                parts.append("• ✅ El sistema funciona eficientemente\n")
             
-            response += f"""
+            parts.append(f"""
 
 💡 **Recomendaciones Prioritarias:**
 1. 📊 Establecer KPIs claros por proyecto
@@ -701,18 +871,80 @@ class AIAssistantService:
 3. 💰 Análisis mensual de patrones de gasto
 4. 👥 Evaluación trimestral de productividad
 
-📈 **Potencial de Mejora:** {'Alto' if len(opportunities) > 3 else 'Medio' if len(opportunities) > 1 else 'Optimo'}
+📈 **Potencial de Mejora:** {_IMPROVEMENT_POTENTIAL[min(len(opportunities), 4)]}
 
-¿Quieres que analice alguna área específica en detalle?"""
-            return response
+¿Quieres que analice alguna área específica en detalle?""")
+            return "".join(parts)
         
         # Respuesta general con datos
-        response = f"""🤖 **Asistente de Gestión - Resumen**
+        return self._render_general_summary(build_org_summary(projects, expenses, attendance))
+    
+    def _render_projects_overview(self, summary: Dict) -> str:
+        """Análisis general de proyectos a partir del resumen de la organización"""
+        status_count = summary["status_counts"]
+        total_budget = summary["total_budget"]
+        total_spent = summary["total_spent"]
+        urgent_projects = summary["urgent_projects"]
+        
+        parts = [f"""🚀 **Análisis General de Proyectos**
+
+📊 **Resumen:**
+• **Total de Proyectos:** {summary['project_count']}
+• **Presupuesto Total:** ${total_budget:,.2f} USD
+• **Gastado:** ${total_spent:,.2f} USD
+• **Utilización:** {(total_spent/total_budget*100):.1f}%
+
+📈 **Distribución por Estado:**
+"""]
+        for status, count in status_count.items():
+            parts.append(f"• **{status}:** {count} proyecto{'s' if count != 1 else ''}\n")
+        
+        # Sección de atención urgente
+        if urgent_projects:
+            parts.append(f"""
+
+⚠️ **PROYECTOS QUE REQUIEREN ATENCIÓN URGENTE:**
+""")
+            for p in urgent_projects:
+                budget_used = (p["spent"] / p["budget"] * 100) if p["budget"] else 0
+                
+                if p["status"] in ['on_hold', 'paused']:
+                    parts.append(f"• **{p['name']}** - ⏸️ PAUSADO - necesita reactivación\n")
+                elif p["progress"] and p["progress"] < 20:
+                    parts.append(f"• **{p['name']}** - 📉 BAJO PROGRESO ({p['progress']}%)\n")
+                elif p["budget"] and p["spent"] > p["budget"] * 0.9:
+                    parts.append(f"• **{p['name']}** - 💸 SOBRECOSTO ({budget_used:.1f}% utilizado)\n")
+        else:
+            parts.append(f"""
+
+✅ **Todos los proyectos están en buen estado.**""")
+        
+        parts.append(f"""
+
+🏗️ **Proyectos Activos:**
+""")
+        for p in summary["active_projects"]:
+            parts.append(f"• **{p['name']}** - {p['status']} ({p['progress']}%)\n")
+        
+        parts.append("\n💡 **Recomendaciones:**\n")
+        if urgent_projects:
+            parts.append("• Priorizar los proyectos marcados como atención urgente\n")
+        if status_count.get('on_hold', 0) > 0 or status_count.get('paused', 0) > 0:
+            parts.append(f"• Revisar {status_count.get('on_hold', 0) + status_count.get('paused', 0)} proyecto(s) pausado(s)\n")
+        if total_spent / total_budget > 0.8:
+            parts.append("• Monitorear gastos - utilización presupuestaria alta\n")
+        
+        parts.append("\n¿Quieres analizar algún proyecto específico?")
+        return "".join(parts)
+    
+    def _render_general_summary(self, summary: Dict) -> str:
+        """Respuesta general con los totales de la organización"""
+        return f"""🤖 **Asistente de Gestión - Resumen**
 
 📊 **Tu Sistema:**
-• **Proyectos:** {len(projects)} registrados
-• **Gastos:** {len(expenses)} transacciones
-• **Asistencia:** {len(attendance)} registros
+• **Proyectos:** {summary['project_count']} registrados
+• **Gastos:** {summary['expense_count']} transacciones
+• **Asistencia:** {summary['attendance_count']} registros
 
 💬 **Puedo ayudarte con:**
 • 📁 Análisis detallado de proyectos (menciona el nombre)
@@ -728,8 +960,6 @@ class AIAssistantService:
 - "¿Cómo van mis proyectos?"
 
 ¿En qué te puedo ayudar específicamente?"""
-        
-        return response
     
     async def _get_context_data(self, db: Session, organization_id: int, context_type: str) -> Dict:
         """Obtener datos contextuales según el tipo de consulta"""
@@ -737,14 +967,13 @@ class AIAssistantService:
         context_data = {
             'organization_id': organization_id,
             'context_type': context_type,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _ts_for(int(time.time()))
         }
         
         # Solo obtener datos básicos rápidamente
         try:
             # Contar proyectos y gastos (más rápido que obtener todos los datos)
-            project_count = db.query(Project).filter(Project.organization_id == organization_id).count()
-            expense_count = db.query(Expense).filter(Expense.organization_id == organization_id).count()
+            project_count, expense_count = _cached_counts(db, organization_id)
             
             context_data['summary'] = {
                 'total_projects': project_count,
@@ -752,37 +981,43 @@ class AIAssistantService:
                 'message': f'Tienes {project_count} proyectos y {expense_count} gastos registrados'
             }
         except Exception as e:
-            logger.error(f"Error getting context data: {e}")
+            logger.error("Error getting context data: %s", e)
             context_data['summary'] = {'message': 'Datos no disponibles temporalmente'}
         
         # Simplificado - no hacer llamadas adicionales para evitar timeouts
         return context_data
     
+    def _template_key(self, context_type: str) -> str:
+        """Resolver la plantilla a usar para un tipo de contexto"""
+        return context_type if context_type in self.context_templates else 'general_assistant'
+    
+    def _render_template(self, template_key: str, context_data: Dict) -> str:
+        """Rellenar la plantilla con los datos del contexto"""
+        return self._renderers[template_key](context_data)
+    
     def _build_prompt(self, message: str, context_type: str, context_data: Dict) -> str:
         """Construir prompt para la IA"""
-        template = self.context_templates.get(context_type, self.context_templates['general_assistant'])
-        
-        # Formatear datos del contexto
-        formatted_context = json.dumps(context_data, indent=2, default=str)
-        
-        # Construir prompt completo
-        full_prompt = template.format(
-            context_data=formatted_context,
-            project_data=json.dumps(context_data.get('projects', []), indent=2, default=str),
-            expense_data=json.dumps(context_data.get('recent_expenses', []), indent=2, default=str),
-            budget_data=json.dumps(context_data.get('budgets', []), indent=2, default=str),
-            utilization_data=json.dumps(context_data.get('resource_utilization', {}), indent=2, default=str),
-            productivity_data=json.dumps(context_data.get('productivity_metrics', {}), indent=2, default=str),
-            cost_data=json.dumps(context_data.get('financial_summary', {}), indent=2, default=str),
-            financial_data=json.dumps(context_data.get('financial_summary', {}), indent=2, default=str),
-            trends_data=json.dumps(context_data.get('trends', []), indent=2, default=str),
-            budget_comparison=json.dumps(context_data.get('budget_comparison', {}), indent=2, default=str)
-        )
+        renderer = self._renderers.get(context_type, self._renderers['general_assistant'])
         
         # Agregar la pregunta del usuario
-        full_prompt += f"\n\nPregunta del usuario: {message}\n\nRespuesta:"
+        return f"{renderer(context_data)}\n\nPregunta del usuario: {message}\n\nRespuesta:"
+    
+    def _build_messages(self, message: str, context_type: str, context_data: Dict) -> List[Dict]:
+        """Construir mensajes de chat con el prefijo estático primero (cacheable), datos y luego la pregunta"""
+        template_key = self._template_key(context_type)
+        prefix = self._template_prefixes[template_key]
+        rendered = self._render_template(template_key, context_data)
         
-        return full_prompt
+        return [
+            {
+                "role": "system",
+                "content": [
+                    {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": rendered[len(prefix):]}
+                ]
+            },
+            {"role": "user", "content": message}
+        ]
     
     async def _call_ai_api(self, prompt: str) -> str:
         """Llamar a la API de IA (OpenAI u otra)"""
@@ -808,47 +1043,12 @@ class AIAssistantService:
             """
                 
         except Exception as e:
-            logger.error(f"Error calling AI API: {e}")
+            logger.error("Error calling AI API: %s", e)
             return self._get_fallback_response(prompt)
     
     def _get_fallback_response(self, prompt: str) -> str:
         """Respuestas de fallback cuando no hay API de IA disponible"""
-        prompt_lower = prompt.lower()
-        
-        # Saludos
-        if any(word in prompt_lower for word in ["hola", "buenos", "buenas", "saludos", "hey", "hi"]):
-            return "👋 ¡Hola! Soy tu asistente de gestión empresarial.\n\n**Puedo ayudarte con:**\n\n• 📁 Análisis de proyectos\n• 💰 Control de gastos y presupuestos\n• ⏰ Reportes de asistencia\n• 📈 Tendencias y predicciones\n• 👥 Optimización de recursos\n\n¿En qué te puedo ayudar hoy?"
-        
-        # Proyectos
-        if any(word in prompt_lower for word in ["proyecto", "proyectos"]):
-            return "🚀 **Análisis de Proyectos**\n\nTienes 13 proyectos registrados en el sistema. Te recomiendo:\n\n• Revisar los proyectos en estado 'pausado' o 'planificación'\n• Priorizar aquellos con fechas límite próximas\n• Monitorear el presupuesto asignado vs gastado\n\n¿Te gustaría ver un informe detallado de algún proyecto específico?"
-        
-        # Gastos
-        if any(word in prompt_lower for word in ["gasto", "gastos", "costo", "costos", "dinero", "presupuesto"]):
-            return "💰 **Análisis de Gastos**\n\nHe analizado tus 53 registros de gastos:\n\n• **Total registrado:** Varias categorías activas\n• **Categorías principales:** Obras, Servicios, Materiales\n• **Recomendación:** Revisa los gastos de 'obra' que suelen ser los más significativos\n\n¿Quieres un análisis detallado por categoría o período?"
-        
-        # Recursos
-        if any(word in prompt_lower for word in ["recurso", "recursos", "consultor", "consultores", "equipo", "personal"]):
-            return "👥 **Optimización de Recursos**\n\nBasado en los datos de asistencia:\n\n• **Horas trabajadas:** 43 registros disponibles\n• **Promedio diario:** ~8 horas por consultor\n• **Recomendación:** Considera redistribuir carga si hay picos de trabajo\n\n¿Necesitas un análisis detallado de productividad?"
-        
-        # Asistencia
-        if any(word in prompt_lower for word in ["asistencia", "horas", "horario", "tiempo"]):
-            return "⏰ **Análisis de Asistencia**\n\nTienes 43 registros de asistencia:\n\n• **Días registrados:** Aproximadamente 2 meses de datos\n• **Horas promedio:** 8 horas diarias\n• **Tendencia:** Estable y consistente\n\n¿Quieres ver reportes por período o consultor?"
-        
-        # Tendencias
-        if any(word in prompt_lower for word in ["tendencia", "tendencias", "análisis", "analisis", "predicción", "prediccion", "forecast"]):
-            return "📈 **Análisis de Tendencias**\n\nCon tus datos actuales puedo analizar:\n\n• **Evolución de gastos** por categoría\n• **Progresos de proyectos** en el tiempo\n• **Patrones de asistencia** del equipo\n\n¿Qué tendencia específica te interesa analizar?"
-        
-        # Reportes
-        if any(word in prompt_lower for word in ["reporte", "reportes", "informe", "informes"]):
-            return "📊 **Generación de Reportes**\n\nPuedo generar reportes sobre:\n\n• **Proyectos:** Estado, avance, presupuesto\n• **Gastos:** Por categoría, período, proyecto\n• **Asistencia:** Por consultor, equipo, período\n• **Financiero:** Análisis completo de ingresos/gastos\n\n¿Qué tipo de reporte necesitas?"
-        
-        # Ayuda
-        if any(word in prompt_lower for word in ["ayuda", "help", "qué puedes", "que puedes", "cómo", "como"]):
-            return "🤖 **¿Cómo puedo ayudarte?**\n\nEstoy diseñado para asistirte con:\n\n• 📁 **Proyectos:** Estado, análisis, recomendaciones\n• 💰 **Gastos:** Seguimiento, categorización, alertas\n• ⏰ **Asistencia:** Reportes, productividad, horas\n• 📈 **Tendencias:** Predicciones y análisis histórico\n• 👥 **Recursos:** Optimización y distribución\n\n**Ejemplos de preguntas:**\n- \"¿Cómo van mis proyectos?\"\n- \"Muéstrame los gastos del mes\"\n- \"¿Cuál es la tendencia de gastos?\"\n- \"Analiza la asistencia del equipo\""
-        
-        # Default
-        return "🤖 **Asistente de Gestión**\n\nNo estoy seguro de entender tu consulta. Puedo ayudarte con:\n\n• 📁 Análisis de proyectos\n• 💰 Control de gastos\n• ⏰ Reportes de asistencia\n• 📈 Tendencias y predicciones\n• 👥 Optimización de recursos\n\n¿Podrías ser más específico sobre lo que necesitas?"
+        return _FALLBACK_RESPONSES[_classify_intent(prompt.lower())]
     
     async def _save_conversation(self, db: Session, user_id: int, message: str, response: str):
         """Guardar conversación (implementar si se necesita historial)"""
@@ -857,7 +1057,11 @@ class AIAssistantService:
     
     async def _get_project_data(self, db: Session, organization_id: int, project_id: int) -> Dict:
         """Obtener datos detallados de un proyecto"""
-        project = db.query(Project).filter(
+        # Proyecto, gastos y miembros con carga por lotes (SELECT ... IN)
+        project = db.query(Project).options(
+            selectinload(Project.expenses),
+            selectinload(Project.members)
+        ).filter(
             Project.id == project_id,
             Project.organization_id == organization_id
         ).first()
@@ -865,15 +1069,23 @@ class AIAssistantService:
         if not project:
             return {}
         
-        # Obtener gastos del proyecto
-        expenses = db.query(Expense).filter(
-            Expense.project_id == project_id
-        ).all()
+        expenses = project.expenses
         
-        # Obtener asistencia del proyecto
-        attendances = db.query(Attendance).filter(
-            Attendance.project_id == project_id
-        ).all()
+        # Attendance no referencia proyectos: asistencia de los miembros asignados
+        # en esta organización, acotada a las fechas del proyecto si las tiene
+        attendances = []
+        member_ids = [member.id for member in project.members]
+        if member_ids:
+            attendance_query = db.query(Attendance).filter(
+                Attendance.organization_id == organization_id,
+                Attendance.user_id.in_(member_ids)
+            )
+            if project.start_date:
+                attendance_query = attendance_query.filter(Attendance.check_in >= project.start_date)
+            if project.end_date:
+                # end_date inclusiva: se cuenta todo el último día
+                attendance_query = attendance_query.filter(Attendance.check_in < project.end_date + timedelta(days=1))
+            attendances = attendance_query.order_by(Attendance.check_in).all()
         
         return {
             'project': {
@@ -910,9 +1122,21 @@ class AIAssistantService:
     
     async def _get_all_projects_data(self, db: Session, organization_id: int) -> Dict:
         """Obtener datos de todos los proyectos de la organización"""
-        projects = db.query(Project).filter(
+        # Solo las columnas y los proyectos que se muestran
+        projects = db.query(
+            Project.id, Project.name, Project.status, Project.budget, Project.created_at
+        ).filter(
             Project.organization_id == organization_id
-        ).all()
+        ).order_by(desc(Project.created_at)).limit(ALL_PROJECTS_LIST_LIMIT).all()
+        
+        # Agregados calculados en la base de datos
+        total_projects, active_projects, total_budget = db.query(
+            func.count(Project.id),
+            func.count(Project.id).filter(Project.status == 'active'),
+            func.coalesce(func.sum(Project.budget), 0)
+        ).filter(
+            Project.organization_id == organization_id
+        ).one()
         
         return {
             'projects': [
@@ -925,9 +1149,9 @@ class AIAssistantService:
                 }
                 for p in projects
             ],
-            'total_projects': len(projects),
-            'active_projects': len([p for p in projects if p.status == 'active']),
-            'total_budget': sum(p.budget or 0 for p in projects)
+            'total_projects': total_projects,
+            'active_projects': active_projects,
+            'total_budget': total_budget
         }
     
     def _build_report_prompt(self, data: Dict, report_type: str) -> str:
@@ -935,7 +1159,7 @@ class AIAssistantService:
         base_prompt = f"""
         Eres un experto en generación de informes empresariales. Genera un informe {report_type} basado en los siguientes datos:
         
-        {json.dumps(data, indent=2, default=str)}
+        {json.dumps(data, default=str)}
         
         El informe debe incluir:
         1. Resumen ejecutivo
@@ -962,26 +1186,17 @@ class AIAssistantService:
     
     def _parse_report_sections(self, content: str) -> List[Dict]:
         """Parsear secciones del informe"""
-        # Implementar parsing del contenido para identificar secciones
-        sections = []
-        lines = content.split('\n')
-        current_section = None
-        
-        for line in lines:
-            if line.strip().startswith('#') or line.strip().startswith('##'):
-                if current_section:
-                    sections.append(current_section)
-                current_section = {
-                    'title': line.strip().replace('#', '').strip(),
-                    'content': []
-                }
-            elif current_section and line.strip():
-                current_section['content'].append(line.strip())
-        
-        if current_section:
-            sections.append(current_section)
+        # Un solo recorrido del regex sobre los encabezados; el contenido es el texto hasta el siguiente
+        headers = list(_SECTION_HEADER_RE.finditer(content))
+        ends = [m.start() for m in headers[1:]] + [len(content)]
         
-        return sections
+        return [
+            {
+                'title': header.group(0).replace('#', '').strip(),
+                'content': [line.strip() for line in content[header.end():end].split('\n') if line.strip()]
+            }
+            for header, end in zip(headers, ends)
+        ]
     
     def _extract_key_metrics(self, content: str) -> List[str]:
         """Extraer métricas clave del contenido"""
@@ -1000,20 +1215,23 @@ class AIAssistantService:
         """Obtener datos históricos de gastos"""
         start_date = datetime.utcnow() - timedelta(days=days_back)
         
-        expenses = db.query(Expense).filter(
+        # Solo las columnas necesarias (sin objetos ORM), leídas del cursor en lotes
+        rows = db.query(
+            Expense.id, Expense.amount, Expense.category, Expense.description, Expense.created_at
+        ).filter(
             Expense.organization_id == organization_id,
             Expense.created_at >= start_date
-        ).order_by(Expense.created_at).all()
+        ).order_by(Expense.created_at).yield_per(1000)
         
         return [
             {
-                'id': e.id,
-                'amount': e.amount,
-                'category': e.category,
-                'description': e.description,
-                'created_at': e.created_at.isoformat()
+                'id': r.id,
+                'amount': r.amount,
+                'category': r.category,
+                'description': r.description,
+                'created_at': r.created_at.isoformat()
             }
-            for e in expenses
+            for r in rows
         ]
     
     async def _analyze_expense_patterns(self, historical_data: List[Dict], predictions: Dict) -> Dict:
@@ -1022,10 +1240,10 @@ class AIAssistantService:
         Analiza los siguientes datos de gastos históricos y predicciones:
         
         Datos históricos:
-        {json.dumps(historical_data, indent=2, default=str)}
+        {json.dumps(historical_data, default=str)}
         
         Predicciones ML:
-        {json.dumps(predictions, indent=2, default=str)}
+        {json.dumps(predictions, default=str)}
         
         Proporciona análisis de:
         1. Patrones estacionales
@@ -1105,9 +1323,9 @@ class AIAssistantService:
         analysis_prompt = f"""
         Analiza las siguientes oportunidades de optimización:
         
-        Recursos: {json.dumps(resource_data, indent=2)}
-        Productividad: {json.dumps(productivity_data, indent=2)}
-        Finanzas: {json.dumps(financial_data, indent=2)}
+        Recursos: {json.dumps(resource_data)}
+        Productividad: {json.dumps(productivity_data)}
+        Finanzas: {json.dumps(financial_data)}
         
         Identifica las 3 mejores oportunidades de optimización con impacto medible.
         """
@@ -1130,6 +1348,8 @@ class AIAssistantService:
                 'description': 'Reasignar tareas de consultores sobrecargados a subutilizados',
                 'expected_impact': '+15% productividad',
                 'cost': 'bajo',
+                'impact_pct': 15.0,
+                'cost_bucket': 0,
                 'timeline': '2 semanas',
                 'steps': ['Analizar carga actual', 'Identificar brechas', 'Reasignar tareas', 'Monitorear resultados']
             },
@@ -1139,6 +1359,8 @@ class AIAssistantService:
                 'description': 'Implementar generación automática de informes para reducir tiempo administrativo',
                 'expected_impact': '-10 horas/semana',
                 'cost': 'medio',
+                'impact_pct': 0.0,
+                'cost_bucket': 1,
                 'timeline': '1 mes',
                 'steps': ['Evaluar herramientas', 'Implementar solución', 'Capacitar equipo', 'Medir ahorro']
             }
@@ -1146,25 +1368,12 @@ class AIAssistantService:
     
     async def _calculate_optimization_impact(self, suggestions: List[Dict], financial_data: Dict) -> Dict:
         """Calcular impacto potencial de las optimizaciones"""
-        total_savings = 0
-        total_investment = 0
+        # Impacto (%) y nivel de costo numéricos de cada sugerencia (-1 = sin costo estimado)
+        impacts = np.fromiter((x.get('impact_pct', 0.0) for x in suggestions), dtype=np.float64, count=len(suggestions))
+        costs = np.fromiter((x.get('cost_bucket', -1) for x in suggestions), dtype=np.int8, count=len(suggestions))
         
-        for suggestion in suggestions:
-            # Calcular impacto basado en métricas
-            if 'cost' in suggestion:
-                if suggestion['cost'] == 'bajo':
-                    total_investment += 5000
-                elif suggestion['cost'] == 'medio':
-                    total_investment += 15000
-                elif suggestion['cost'] == 'alto':
-                    total_investment += 50000
-            
-            # Estimar ahorros
-            if 'expected_impact' in suggestion:
-                impact_str = suggestion['expected_impact']
-                if '+' in impact_str and '%' in impact_str:
-                    percentage = float(impact_str.split('+')[1].split('%')[0])
-                    total_savings += financial_data.get('total_revenue', 0) * (percentage / 100)
+        total_investment = int(_COST_TABLE[costs[costs >= 0]].sum())
+        total_savings = float(financial_data.get('total_revenue', 0) * impacts.sum() / 100)
         
         roi = ((total_savings - total_investment) / total_investment * 100) if total_investment > 0 else 0
         
@@ -1178,12 +1387,10 @@ class AIAssistantService:
     
     def _prioritize_suggestions(self, suggestions: List[Dict]) -> List[Dict]:
         """Priorizar sugerencias basado en impacto y esfuerzo"""
-        # Implementar lógica de priorización
+        # Prioridad alta y costo bajo primero; sin valor cuenta como media/medio, valores desconocidos al final
         return sorted(suggestions, key=lambda x: (
-            x.get('priority', 'media') == 'alta' and 0 or
-            x.get('priority', 'media') == 'media' and 1 or 2,
-            x.get('cost', 'medio') == 'bajo' and 0 or
-            x.get('cost', 'medio') == 'medio' and 1 or 2
+            _PRIORITY_ORDER.get(x.get('priority', 'media'), 2),
+            _COST_ORDER.get(x.get('cost', 'medio'), 2)
         ))
 
 # Global AI assistant service instance
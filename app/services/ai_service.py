@@ -1,33 +1,85 @@
-from typing import Optional
+import asyncio
+import functools
+import json
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_PROMPT = """Eres un asistente de ventas profesional para una empresa de construcción.
+Tu objetivo es:
+1. Responder consultas sobre proyectos y servicios
+2. Agendar reuniones y visitas
+3. Proporcionar presupuestos iniciales
+4. Mantener un tono amigable y profesional
+5. Recopilar información del cliente (nombre, proyecto, ubicación, presupuesto)
+
+Responde de manera concisa y clara en español."""
+
+OLLAMA_MODEL = "llama2"
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "mixtral-8x7b-32768"
+OPENAI_MODEL = "gpt-3.5-turbo"
+# Generous read timeout: local models can take a while to answer
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
+# Provider SDK clients are process-wide singletons so their connection pools are reused.
+# Failed initializations raise and are not cached, so they are retried on the next call.
+@functools.lru_cache(maxsize=None)
+def _async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+@functools.lru_cache(maxsize=None)
+def _anthropic_client():
+    from anthropic import Anthropic
+    return Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+
 
 class AIService:
     """Service for AI-powered responses. Supports multiple providers."""
     
     def __init__(self):
         self.provider = settings.AI_PROVIDER
-        self._client = None
+        # In-flight generations keyed by request, shared by identical concurrent calls
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # Shared keep-alive pool for the HTTP providers (ollama, groq), opened on first use
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def _http(self) -> httpx.AsyncClient:
+        """Pooled HTTP client, reopened if a previous shutdown closed it."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            )
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     def _get_openai_client(self):
         """Initialize OpenAI client."""
         try:
-            from openai import OpenAI
-            return OpenAI(api_key=settings.OPENAI_API_KEY)
+            return _async_openai_client()
         except Exception as e:
-            logger.error(f"Error initializing OpenAI: {e}")
+            logger.error("Error initializing OpenAI: %s", e)
             return None
     
     def _get_anthropic_client(self):
         """Initialize Anthropic client."""
         try:
-            from anthropic import Anthropic
-            return Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+            return _anthropic_client()
         except Exception as e:
-            logger.error(f"Error initializing Anthropic: {e}")
+            logger.error("Error initializing Anthropic: %s", e)
             return None
     
     async def generate_response(
@@ -48,16 +100,20 @@ class AIService:
             AI-generated response
         """
         if not system_prompt:
-            system_prompt = """Eres un asistente de ventas profesional para una empresa de construcción.
-Tu objetivo es:
-1. Responder consultas sobre proyectos y servicios
-2. Agendar reuniones y visitas
-3. Proporcionar presupuestos iniciales
-4. Mantener un tono amigable y profesional
-5. Recopilar información del cliente (nombre, proyecto, ubicación, presupuesto)
-
-Responde de manera concisa y clara en español."""
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        
+        # Identical concurrent requests (e.g. webhook retries) share a single provider call
+        key = (self.provider, system_prompt, context, message)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._dispatch(message, context, system_prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
         
+        return await asyncio.shield(task)
+    
+    async def _dispatch(self, message: str, context: Optional[str], system_prompt: str) -> str:
+        """Call the configured provider, returning a fallback message on errors."""
         try:
             if self.provider == "openai":
                 return await self._generate_openai(message, context, system_prompt)
@@ -70,27 +126,110 @@ Responde de manera concisa y clara en español."""
             else:
                 return "Lo siento, el servicio de IA no está configurado correctamente."
         except Exception as e:
-            logger.error(f"Error generating AI response: {e}")
+            logger.error("Error generating AI response: %s", e)
             return "Disculpa, estoy teniendo problemas técnicos. ¿Podrías contactar directamente con nuestro equipo?"
     
-    async def _generate_openai(self, message: str, context: Optional[str], system_prompt: str) -> str:
-        """Generate response using OpenAI."""
-        if not self._client:
-            self._client = self._get_openai_client()
-        
-        if not self._client:
-            raise Exception("OpenAI client not initialized")
-        
+    def _chat_messages(self, message: str, context: Optional[str], system_prompt: str) -> List[Dict]:
+        """Build the chat messages for chat-completions providers."""
         messages = [{"role": "system", "content": system_prompt}]
         
         if context:
             messages.append({"role": "system", "content": f"Contexto: {context}"})
         
         messages.append({"role": "user", "content": message})
+        return messages
+    
+    def _groq_headers(self) -> Dict[str, str]:
+        """Authentication headers for the Groq API."""
+        return {
+            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
+            "Content-Type": "application/json"
+        }
+    
+    async def stream_response(
+        self,
+        message: str,
+        context: Optional[str] = None,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the AI response as it is generated.
+        
+        OpenAI and Groq yield tokens as they arrive; other providers yield
+        the complete response as a single chunk.
+        
+        Args:
+            message: User message to respond to
+            context: Additional context about the conversation
+            system_prompt: Custom system prompt
+        
+        Yields:
+            Fragments of the AI-generated response
+        """
+        if not system_prompt:
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        
+        try:
+            if self.provider == "openai":
+                async for chunk in self._stream_openai(message, context, system_prompt):
+                    yield chunk
+            elif self.provider == "groq":
+                async for chunk in self._stream_groq(message, context, system_prompt):
+                    yield chunk
+            else:
+                yield await self.generate_response(message, context, system_prompt)
+        except Exception as e:
+            logger.error("Error streaming AI response: %s", e)
+            yield "Disculpa, estoy teniendo problemas técnicos. ¿Podrías contactar directamente con nuestro equipo?"
+    
+    async def _stream_openai(self, message: str, context: Optional[str], system_prompt: str) -> AsyncIterator[str]:
+        """Stream a response from OpenAI."""
+        response = await _async_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=self._chat_messages(message, context, system_prompt),
+            max_tokens=300,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _stream_groq(self, message: str, context: Optional[str], system_prompt: str) -> AsyncIterator[str]:
+        """Stream a response from Groq (OpenAI-compatible server-sent events)."""
+        async with self._http.stream(
+            "POST",
+            GROQ_URL,
+            headers=self._groq_headers(),
+            json={
+                "model": GROQ_MODEL,
+                "messages": self._chat_messages(message, context, system_prompt),
+                "max_tokens": 300,
+                "temperature": 0.7,
+                "stream": True
+            }
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+    
+    async def _generate_openai(self, message: str, context: Optional[str], system_prompt: str) -> str:
+        """Generate response using OpenAI."""
+        client = self._get_openai_client()
+        
+        if not client:
+            raise Exception("OpenAI client not initialized")
         
-        response = self._client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
+        response = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=self._chat_messages(message, context, system_prompt),
             max_tokens=300,
             temperature=0.7
         )
@@ -99,10 +238,9 @@ Responde de manera concisa y clara en español."""
     
     async def _generate_anthropic(self, message: str, context: Optional[str], system_prompt: str) -> str:
         """Generate response using Anthropic Claude."""
-        if not self._client:
-            self._client = self._get_anthropic_client()
+        client = self._get_anthropic_client()
         
-        if not self._client:
+        if not client:
             raise Exception("Anthropic client not initialized")
         
         prompt = f"{system_prompt}\n\n"
@@ -110,7 +248,7 @@ Responde de manera concisa y clara en español."""
             prompt += f"Contexto: {context}\n\n"
         prompt += f"Usuario: {message}\n\nAsistente:"
         
-        response = self._client.completions.create(
+        response = client.completions.create(
             model="claude-2",
             prompt=prompt,
             max_tokens_to_sample=300
@@ -120,8 +258,6 @@ Responde de manera concisa y clara en español."""
     
     async def _generate_ollama(self, message: str, context: Optional[str], system_prompt: str) -> str:
         """Generate response using Ollama (local)."""
-        import requests
-        
         url = f"{settings.OLLAMA_BASE_URL}/api/generate"
         
         prompt = f"{system_prompt}\n\n"
@@ -129,40 +265,48 @@ Responde de manera concisa y clara en español."""
             prompt += f"Contexto: {context}\n\n"
         prompt += f"Usuario: {message}\n\nAsistente:"
         
-        response = requests.post(
+        response = await self._http.post(
             url,
             json={
-                "model": "llama2",
+                "model": OLLAMA_MODEL,
                 "prompt": prompt,
-                "stream": False
+                "stream": False,
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE
             }
         )
         
         return response.json().get("response", "")
     
-    async def _generate_groq(self, message: str, context: Optional[str], system_prompt: str) -> str:
-        """Generate response using Groq."""
-        import requests
-        
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        if context:
-            messages.append({"role": "system", "content": f"Contexto: {context}"})
+    async def warmup(self, system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> None:
+        """
+        Preload the local model with the system prompt.
         
-        messages.append({"role": "user", "content": message})
+        Ollama reuses the KV cache of a matching prompt prefix while the model
+        stays loaded, so later requests skip prefill for the system prompt.
+        Only applies to the ollama provider.
+        """
+        if self.provider != "ollama":
+            return
         
-        response = requests.post(
-            url,
-            headers=headers,
+        await self._http.post(
+            f"{settings.OLLAMA_BASE_URL}/api/generate",
+            json={
+                "model": OLLAMA_MODEL,
+                "prompt": f"{system_prompt}\n\n",
+                "stream": False,
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                "options": {"num_predict": 1}
+            }
+        )
+    
+    async def _generate_groq(self, message: str, context: Optional[str], system_prompt: str) -> str:
+        """Generate response using Groq."""
+        response = await self._http.post(
+            GROQ_URL,
+            headers=self._groq_headers(),
             json={
-                "model": "mixtral-8x7b-32768",
-                "messages": messages,
+                "model": GROQ_MODEL,
+                "messages": self._chat_messages(message, context, system_prompt),
                 "max_tokens": 300,
                 "temperature": 0.7
             }
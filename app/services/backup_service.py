@@ -1,22 +1,320 @@
 import os
 import json
+import re
 import shutil
+import tempfile
+import threading
 import zipfile
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import sqlalchemy as sa
-from sqlalchemy.orm import Session
-from app.core.database import engine
+from sqlalchemy.orm import Session, sessionmaker
 from app.models import User, Expense, Attendance, Project, Client, Organization
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per batch when dumping tables
+BACKUP_BATCH_SIZE = 5000
+
+# Rows per executemany batch when restoring tables
+RESTORE_BATCH_SIZE = 10000
+
+# Metadata copy written next to each zipped backup, so listing doesn't open the archive
+METADATA_SIDECAR_SUFFIX = ".meta.json"
+
+# Organization suffix in backup names: backup_YYYYmmdd_HHMMSS[_org_<id>]
+_BACKUP_ORG_RE = re.compile(r'_org_(\d+)')
+
+# Environment variable names never written to backups
+_SENSITIVE_ENV_RE = re.compile(r'PASSWORD|SECRET|TOKEN|KEY|DATABASE_URL', re.IGNORECASE)
+
+# Tables included in every backup
+BACKUP_TABLES = {
+    'users': User,
+    'expenses': Expense,
+    'attendance': Attendance,
+    'projects': Project,
+    'clients': Client,
+    'organizations': Organization
+}
+
+
+def _table_layout(model) -> Tuple[List[str], List[int]]:
+    """Column names of a model's table and the positions of its DateTime columns"""
+    columns = list(model.__table__.columns)
+    return (
+        [column.name for column in columns],
+        [index for index, column in enumerate(columns) if isinstance(column.type, sa.DateTime)]
+    )
+
+
+# Column layout of each backed-up table, resolved once
+_TABLE_LAYOUTS = {name: _table_layout(model) for name, model in BACKUP_TABLES.items()}
+
+
+# Threads used to copy uploaded files
+COPY_WORKERS = 8
+
+
+def _copy_file(src: str, dst: str):
+    """copy2 that lets the kernel copy the data (a reflink on btrfs/XFS) when it can"""
+    copied = False
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    written = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if written == 0:
+                        break
+                    remaining -= written
+            copied = remaining == 0
+        except OSError:
+            # Cross-device or unsupported filesystem
+            copied = False
+    if not copied:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+class _ParallelCopier(ThreadPoolExecutor):
+    """copytree copy_function that copies files concurrently"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+
+    def copy(self, src: str, dst: str):
+        self.futures.append(self.submit(_copy_file, src, dst))
+
+
+def _copytree(src: str, dst: str):
+    """shutil.copytree with per-file copies spread across COPY_WORKERS threads"""
+    with _ParallelCopier(max_workers=COPY_WORKERS) as copier:
+        shutil.copytree(src, dst, copy_function=copier.copy, dirs_exist_ok=True)
+    # Surface the first copy error, as a serial copytree would
+    for future in copier.futures:
+        future.result()
+
+
+# Buffer used when streaming data into and out of zip members
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Members at least this large get Zip64 headers (half the limit leaves room for deflate overhead)
+ZIP64_THRESHOLD = zipfile.ZIP64_LIMIT // 2
+
+# Threads deflating upload files, the largest file deflated in memory, and the
+# total size of the files being deflated or waiting to be written at once
+# (each one holds its data plus its compressed payload)
+COMPRESS_WORKERS = min(8, os.cpu_count() or 1)
+PARALLEL_DEFLATE_MAX_SIZE = 4 * 1024 * 1024
+PARALLEL_DEFLATE_MAX_INFLIGHT = 64 * 1024 * 1024
+
+# Table dumps larger than this spill from memory to a temp file before zipping
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def _scan_tree(root: str):
+    """Yield (path, stat) for every regular file under root, using scandir's cached entries"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_tree(entry.path)
+            elif entry.is_file():
+                yield entry.path, entry.stat()
+
+
+def _file_manifest(root: str) -> List[Tuple[str, int]]:
+    """(path, size) of every file under root, largest first"""
+    manifest = [(path, st.st_size) for path, st in _scan_tree(root)]
+    manifest.sort(key=lambda item: item[1], reverse=True)
+    return manifest
+
+
+def _deflate_member(file_path: str, member: str, level: int) -> Tuple[zipfile.ZipInfo, bytes]:
+    """Raw-deflate a file the way zipfile does, returning its ZipInfo and payload"""
+    zinfo = zipfile.ZipInfo.from_file(file_path, member)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(payload)
+    zinfo.CRC = zlib.crc32(data)
+    return zinfo, payload
+
+
+class _DirectorySink:
+    """Writes backup members as plain files under a directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @contextmanager
+    def open(self, arcname: str):
+        path = os.path.join(self.root, arcname)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            yield f
+
+    def add_tree(self, src: str, arcname: str):
+        _copytree(src, os.path.join(self.root, arcname))
+
+
+class _ZipSink:
+    """Writes backup members straight into an open ZipFile"""
+
+    def __init__(self, zipf: zipfile.ZipFile):
+        self.zipf = zipf
+        # ZipFile accepts a single writer at a time
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, arcname: str):
+        # Buffer so concurrent table dumps don't hold the archive while they run
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+            yield buffer
+            buffer.seek(0)
+            with self._lock, self.zipf.open(arcname, 'w', force_zip64=True) as member:
+                shutil.copyfileobj(buffer, member, ZIP_CHUNK_SIZE)
+
+    def add_tree(self, src: str, arcname: str):
+        # Manifest up front: total size for logging, largest files first
+        manifest = _file_manifest(src)
+        logger.info(f"Archiving {len(manifest)} files ({sum(size for _, size in manifest)} bytes) from {src}")
+
+        parallel = []
+        for file_path, size in manifest:
+            member = os.path.join(arcname, os.path.relpath(file_path, src))
+            if self.zipf.compression == zipfile.ZIP_DEFLATED and size <= PARALLEL_DEFLATE_MAX_SIZE:
+                parallel.append((file_path, member, size))
+                continue
+            # Large files are streamed instead of held in memory
+            with self._lock, open(file_path, 'rb') as source, \
+                    self.zipf.open(member, 'w', force_zip64=size >= ZIP64_THRESHOLD) as target:
+                shutil.copyfileobj(source, target, ZIP_CHUNK_SIZE)
+
+        if parallel:
+            self._add_deflated(parallel)
+
+    def _add_deflated(self, files: List[Tuple[str, str, int]]):
+        """Deflate files in a thread pool (zlib releases the GIL) and append them in order"""
+        level = self.zipf.compresslevel
+        if level is None:
+            level = zlib.Z_DEFAULT_COMPRESSION
+
+        pending = deque()
+        in_flight = 0
+        with ThreadPoolExecutor(max_workers=COMPRESS_WORKERS) as executor:
+            for file_path, member, size in files:
+                # Bound the file data held in memory: write finished members before submitting more
+                while pending and in_flight + size > PARALLEL_DEFLATE_MAX_INFLIGHT:
+                    future, done_size = pending.popleft()
+                    self._write_deflated(*future.result())
+                    in_flight -= done_size
+                pending.append((executor.submit(_deflate_member, file_path, member, level), size))
+                in_flight += size
+            while pending:
+                future, _ = pending.popleft()
+                self._write_deflated(*future.result())
+
+    def _write_deflated(self, zinfo: zipfile.ZipInfo, payload: bytes):
+        """Append an already-deflated member, as ZipFile.mkdir appends its entries"""
+        zipf = self.zipf
+        with self._lock, zipf._lock:
+            if zipf._seekable:
+                zipf.fp.seek(zipf.start_dir)
+            zinfo.header_offset = zipf.fp.tell()
+            zipf._writecheck(zinfo)
+            zipf._didModify = True
+            zipf.filelist.append(zinfo)
+            zipf.NameToInfo[zinfo.filename] = zinfo
+            zipf.fp.write(zinfo.FileHeader(False))
+            zipf.fp.write(payload)
+            zipf.start_dir = zipf.fp.tell()
+
+
+class _DirectorySource:
+    """Reads backup members from an uncompressed backup directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def read(self, arcname: str) -> Optional[bytes]:
+        path = os.path.join(self.root, arcname)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def extract_tree(self, arcname: str, dst: str) -> bool:
+        src = os.path.join(self.root, arcname)
+        if not os.path.isdir(src):
+            return False
+        _copytree(src, dst)
+        return True
+
+
+class _ZipSource:
+    """Reads backup members directly from a zip archive, without extracting it"""
+
+    def __init__(self, zipf: zipfile.ZipFile):
+        self.zipf = zipf
+
+    def read(self, arcname: str) -> Optional[bytes]:
+        try:
+            return self.zipf.read(arcname)
+        except KeyError:
+            return None
+
+    def extract_tree(self, arcname: str, dst: str) -> bool:
+        prefix = arcname.rstrip('/') + '/'
+        members = [
+            info for info in self.zipf.infolist()
+            if info.filename.startswith(prefix) and not info.is_dir()
+        ]
+        for info in members:
+            relative = info.filename[len(prefix):]
+            # Never write outside dst
+            if os.path.isabs(relative) or '..' in relative.split('/'):
+                continue
+            target = os.path.join(dst, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with self.zipf.open(info) as src, open(target, 'wb') as out:
+                shutil.copyfileobj(src, out, ZIP_CHUNK_SIZE)
+        return bool(members)
+
+
+def _backup_org(name: str) -> Optional[int]:
+    """Organization id encoded in a backup name, or None for system-wide backups"""
+    match = _BACKUP_ORG_RE.search(name)
+    return int(match.group(1)) if match else None
+
+
+def _dumps(obj) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (single entry point for the JSON backend)"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _loads(data: bytes):
+    """Parse JSON bytes produced by _dumps"""
+    return json.loads(data)
+
+
 class BackupService:
     def __init__(self):
         self.backup_dir = os.getenv("BACKUP_DIR", "backups")
         self.max_backups = int(os.getenv("MAX_BACKUPS", "10"))
         self.compression = os.getenv("BACKUP_COMPRESSION", "zip")  # zip, tar, none
+        self.compression_level = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "1"))  # 0-9, deflate
+        # (backup_dir mtime_ns, backups) from the last directory scan
+        self._listing_cache: Optional[Tuple[int, List[Tuple[Optional[int], Dict]]]] = None
         
         # Create backup directory if it doesn't exist
         os.makedirs(self.backup_dir, exist_ok=True)
@@ -29,30 +327,19 @@ class BackupService:
             if organization_id:
                 backup_name += f"_org_{organization_id}"
             
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            os.makedirs(backup_path, exist_ok=True)
-
-            # Backup database
-            db_backup_path = self._backup_database(backup_path, organization_id)
-            
-            # Backup files
-            files_backup_path = self._backup_files(backup_path, organization_id)
-            
-            # Backup configuration
-            config_backup_path = self._backup_configuration(backup_path, organization_id)
-            
-            # Create metadata
-            metadata = self._create_metadata(db, organization_id)
-            metadata_path = os.path.join(backup_path, "metadata.json")
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
-
-            # Compress backup
+            # Write members straight into the archive when compressing
             if self.compression == "zip":
-                compressed_path = self._compress_backup(backup_path)
-                # Remove uncompressed folder
-                shutil.rmtree(backup_path)
-                backup_path = compressed_path
+                backup_path = os.path.join(self.backup_dir, f"{backup_name}.zip")
+                with zipfile.ZipFile(
+                    backup_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.compression_level
+                ) as zipf:
+                    metadata = self._write_backup(_ZipSink(zipf), db, organization_id)
+                with open(backup_path + METADATA_SIDECAR_SUFFIX, 'wb') as f:
+                    f.write(_dumps(metadata))
+            else:
+                backup_path = os.path.join(self.backup_dir, backup_name)
+                os.makedirs(backup_path, exist_ok=True)
+                metadata = self._write_backup(_DirectorySink(backup_path), db, organization_id)
 
             # Clean old backups
             self._cleanup_old_backups(organization_id)
@@ -75,60 +362,80 @@ class BackupService:
                 "error": str(e)
             }
 
-    def _backup_database(self, backup_path: str, organization_id: Optional[int] = None) -> str:
-        """Backup database to JSON files"""
-        db_dir = os.path.join(backup_path, "database")
-        os.makedirs(db_dir, exist_ok=True)
-
-        # Get all tables data
-        tables = {
-            'users': User,
-            'expenses': Expense,
-            'attendance': Attendance,
-            'projects': Project,
-            'clients': Client,
-            'organizations': Organization
-        }
+    def _write_backup(self, sink, db: Session, organization_id: Optional[int] = None) -> Dict:
+        """Write database, files, configuration and metadata to the sink"""
+        # Backup database
+        self._backup_database(sink, db, organization_id)
 
-        for table_name, model in tables.items():
-            try:
-                query = db.query(model)
-                
-                # Filter by organization if specified
-                if organization_id and hasattr(model, 'organization_id'):
-                    query = query.filter(model.organization_id == organization_id)
-                
-                records = query.all()
-                
-                # Convert to JSON-serializable format
-                data = []
-                for record in records:
-                    record_dict = {}
-                    for column in record.__table__.columns:
-                        value = getattr(record, column.name)
-                        if isinstance(value, datetime):
-                            record_dict[column.name] = value.isoformat()
-                        else:
-                            record_dict[column.name] = value
-                    data.append(record_dict)
-                
-                # Save to file
-                file_path = os.path.join(db_dir, f"{table_name}.json")
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                
-                logger.info(f"Backed up {len(data)} records from {table_name}")
+        # Backup files
+        self._backup_files(sink, organization_id)
 
-            except Exception as e:
-                logger.error(f"Error backing up table {table_name}: {e}")
+        # Backup configuration
+        self._backup_configuration(sink, organization_id)
 
-        return db_dir
+        # Create metadata
+        metadata = self._create_metadata(db, organization_id)
+        with sink.open("metadata.json") as f:
+            f.write(_dumps(metadata))
 
-    def _backup_files(self, backup_path: str, organization_id: Optional[int] = None) -> str:
-        """Backup uploaded files"""
-        files_dir = os.path.join(backup_path, "files")
-        os.makedirs(files_dir, exist_ok=True)
+        return metadata
+
+    def _backup_database(self, sink, db: Session, organization_id: Optional[int] = None):
+        """Backup database to JSON files, dumping tables concurrently"""
+        # Each worker gets its own session on the caller's database
+        session_factory = sessionmaker(bind=db.get_bind(), autoflush=False)
 
+        workers = min(len(BACKUP_TABLES), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._dump_table, sink, session_factory, table_name, model, organization_id): table_name
+                for table_name, model in BACKUP_TABLES.items()
+            }
+            for future in as_completed(futures):
+                table_name = futures[future]
+                try:
+                    count = future.result()
+                    logger.info(f"Backed up {count} records from {table_name}")
+                except Exception as e:
+                    logger.error(f"Error backing up table {table_name}: {e}")
+
+    def _dump_table(self, sink, session_factory, table_name: str, model, organization_id: Optional[int] = None) -> int:
+        """Dump one table to database/{table_name}.json using its own session"""
+        table = model.__table__
+        stmt = sa.select(table)
+
+        # Filter by organization if specified
+        if organization_id and 'organization_id' in table.c:
+            stmt = stmt.where(table.c.organization_id == organization_id)
+
+        db = session_factory()
+        try:
+            # Stream rows in batches and write the JSON array incrementally
+            rows = db.execute(
+                stmt.execution_options(stream_results=True, yield_per=BACKUP_BATCH_SIZE)
+            )
+            columns, datetime_indexes = _TABLE_LAYOUTS[table_name]
+            count = 0
+            with sink.open(f"database/{table_name}.json") as f:
+                f.write(b'[')
+                for row in rows:
+                    if datetime_indexes:
+                        row = list(row)
+                        for index in datetime_indexes:
+                            if row[index] is not None:
+                                row[index] = row[index].isoformat()
+                    record_dict = dict(zip(columns, row))
+                    if count:
+                        f.write(b',')
+                    f.write(_dumps(record_dict))
+                    count += 1
+                f.write(b']')
+            return count
+        finally:
+            db.close()
+
+    def _backup_files(self, sink, organization_id: Optional[int] = None):
+        """Backup uploaded files"""
         # Source uploads directory
         uploads_dir = os.getenv("UPLOAD_DIR", "uploads")
         if os.path.exists(uploads_dir):
@@ -137,36 +444,27 @@ class BackupService:
                     # Backup only organization-specific files
                     org_uploads_dir = os.path.join(uploads_dir, f"org_{organization_id}")
                     if os.path.exists(org_uploads_dir):
-                        shutil.copytree(org_uploads_dir, os.path.join(files_dir, "uploads"))
+                        sink.add_tree(org_uploads_dir, "files/uploads")
                 else:
                     # Backup all files
-                    shutil.copytree(uploads_dir, os.path.join(files_dir, "uploads"))
+                    sink.add_tree(uploads_dir, "files/uploads")
                 
                 logger.info("Files backed up successfully")
 
             except Exception as e:
                 logger.error(f"Error backing up files: {e}")
 
-        return files_dir
-
-    def _backup_configuration(self, backup_path: str, organization_id: Optional[int] = None) -> str:
+    def _backup_configuration(self, sink, organization_id: Optional[int] = None):
         """Backup configuration files"""
-        config_dir = os.path.join(backup_path, "config")
-        os.makedirs(config_dir, exist_ok=True)
 
         # Backup environment variables (non-sensitive)
-        env_vars = {}
-        sensitive_keys = ['PASSWORD', 'SECRET', 'TOKEN', 'KEY', 'DATABASE_URL']
-        
-        for key, value in os.environ.items():
-            if not any(sensitive in key.upper() for sensitive in sensitive_keys):
-                env_vars[key] = value
-
-        env_path = os.path.join(config_dir, "environment.json")
-        with open(env_path, 'w', encoding='utf-8') as f:
-            json.dump(env_vars, f, indent=2, ensure_ascii=False)
+        env_vars = {
+            key: value for key, value in os.environ.items()
+            if not _SENSITIVE_ENV_RE.search(key)
+        }
 
-        return config_dir
+        with sink.open("config/environment.json") as f:
+            f.write(_dumps(env_vars))
 
     def _create_metadata(self, db: Session, organization_id: Optional[int] = None) -> Dict:
         """Create backup metadata"""
@@ -179,43 +477,37 @@ class BackupService:
             "statistics": {}
         }
 
-        # Get table statistics
-        tables = {
-            'users': User,
-            'expenses': Expense,
-            'attendance': Attendance,
-            'projects': Project,
-            'clients': Client,
-            'organizations': Organization
-        }
+        # Get table statistics (all counts in a single roundtrip)
+        try:
+            counts = []
+            for table_name, model in BACKUP_TABLES.items():
+                table = model.__table__
+                stmt = sa.select(sa.func.count()).select_from(table)
+                if organization_id and 'organization_id' in table.c:
+                    stmt = stmt.where(table.c.organization_id == organization_id)
+                counts.append(stmt.scalar_subquery().label(table_name))
 
-        for table_name, model in tables.items():
-            try:
-                query = db.query(model)
-                if organization_id and hasattr(model, 'organization_id'):
-                    query = query.filter(model.organization_id == organization_id)
-                
-                count = query.count()
-                metadata["tables"][table_name] = count
+            metadata["tables"] = dict(db.execute(sa.select(*counts)).one()._mapping)
 
-            except Exception as e:
-                logger.error(f"Error getting statistics for {table_name}: {e}")
-                metadata["tables"][table_name] = 0
+        except Exception as e:
+            logger.error(f"Error getting table statistics: {e}")
+            metadata["tables"] = dict.fromkeys(BACKUP_TABLES, 0)
 
-        # Calculate additional statistics
+        # Calculate additional statistics (both sums in a single roundtrip)
         try:
-            # Total expenses amount
-            expenses_query = db.query(Expense)
+            expenses_total = sa.select(sa.func.coalesce(sa.func.sum(Expense.amount), 0))
+            hours_total = sa.select(sa.func.coalesce(sa.func.sum(Attendance.hours_worked), 0))
             if organization_id:
-                expenses_query = expenses_query.filter(Expense.organization_id == organization_id)
-            total_expenses = sum(exp.amount for exp in expenses_query.all())
+                expenses_total = expenses_total.where(Expense.organization_id == organization_id)
+                hours_total = hours_total.where(Attendance.organization_id == organization_id)
+
+            total_expenses, total_hours = db.execute(
+                sa.select(
+                    expenses_total.scalar_subquery(),
+                    hours_total.scalar_subquery()
+                )
+            ).one()
             metadata["statistics"]["total_expenses"] = total_expenses
-
-            # Total hours worked
-            attendance_query = db.query(Attendance)
-            if organization_id:
-                attendance_query = attendance_query.filter(Attendance.organization_id == organization_id)
-            total_hours = sum(att.hours_worked or 0 for att in attendance_query.all())
             metadata["statistics"]["total_hours"] = total_hours
 
         except Exception as e:
@@ -223,38 +515,27 @@ class BackupService:
 
         return metadata
 
-    def _compress_backup(self, backup_path: str) -> str:
-        """Compress backup directory to zip file"""
-        zip_path = f"{backup_path}.zip"
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(backup_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, backup_path)
-                    zipf.write(file_path, arcname)
-
-        return zip_path
-
     def _cleanup_old_backups(self, organization_id: Optional[int] = None):
         """Remove old backups keeping only the most recent ones"""
         try:
             # List all backup files
             backup_files = []
-            for file in os.listdir(self.backup_dir):
-                file_path = os.path.join(self.backup_dir, file)
-                if os.path.isfile(file_path) and (file.startswith("backup_") or file.endswith(".zip")):
-                    # Check if it's an organization-specific backup
-                    if organization_id and f"_org_{organization_id}" not in file:
-                        continue
-                    if not organization_id and "_org_" in file:
+            wanted_org = organization_id or None
+            with os.scandir(self.backup_dir) as entries:
+                for entry in entries:
+                    file = entry.name
+                    if file.endswith(METADATA_SIDECAR_SUFFIX):
                         continue
-                    
-                    backup_files.append({
-                        'path': file_path,
-                        'name': file,
-                        'modified': os.path.getmtime(file_path)
-                    })
+                    if entry.is_file() and (file.startswith("backup_") or file.endswith(".zip")):
+                        # Check if it's an organization-specific backup
+                        if _backup_org(file) != wanted_org:
+                            continue
+
+                        backup_files.append({
+                            'path': entry.path,
+                            'name': file,
+                            'modified': entry.stat().st_mtime
+                        })
 
             # Sort by modification time (newest first)
             backup_files.sort(key=lambda x: x['modified'], reverse=True)
@@ -264,6 +545,9 @@ class BackupService:
                 for backup in backup_files[self.max_backups:]:
                     try:
                         os.remove(backup['path'])
+                        sidecar = backup['path'] + METADATA_SIDECAR_SUFFIX
+                        if os.path.exists(sidecar):
+                            os.remove(sidecar)
                         logger.info(f"Removed old backup: {backup['name']}")
                     except Exception as e:
                         logger.error(f"Error removing old backup {backup['name']}: {e}")
@@ -273,10 +557,13 @@ class BackupService:
 
     def _get_file_size(self, file_path: str) -> str:
         """Get human-readable file size"""
-        if not os.path.exists(file_path):
+        try:
+            return self._format_size(os.path.getsize(file_path))
+        except OSError:
             return "0 B"
-        
-        size = os.path.getsize(file_path)
+
+    def _format_size(self, size: float) -> str:
+        """Format a size in bytes as a human-readable string"""
         for unit in ['B', 'KB', 'MB', 'GB']:
             if size < 1024.0:
                 return f"{size:.1f} {unit}"
@@ -285,97 +572,114 @@ class BackupService:
 
     def list_backups(self, organization_id: Optional[int] = None) -> List[Dict]:
         """List all available backups"""
-        backups = []
-        
         try:
-            for file in os.listdir(self.backup_dir):
-                file_path = os.path.join(self.backup_dir, file)
-                
-                # Check if it's a backup file
-                if not (file.startswith("backup_") and (file.endswith(".zip") or os.path.isdir(file_path))):
-                    continue
+            backups = self._scan_backups()
+        except Exception as e:
+            logger.error(f"Error listing backups: {e}")
+            return []
 
-                # Filter by organization if specified
-                if organization_id and f"_org_{organization_id}" not in file:
-                    continue
-                if not organization_id and "_org_" in file:
+        # Filter by organization if specified
+        wanted_org = organization_id or None
+        return [info for org, info in backups if org == wanted_org]
+
+    def _scan_backups(self) -> List[Tuple[Optional[int], Dict]]:
+        """(organization id, info) for every backup in backup_dir (newest first), cached until the directory changes"""
+        mtime = os.stat(self.backup_dir).st_mtime_ns
+        if self._listing_cache and self._listing_cache[0] == mtime:
+            return self._listing_cache[1]
+
+        backups = []
+        complete = True
+        with os.scandir(self.backup_dir) as entries:
+            for entry in entries:
+                file = entry.name
+                file_path = entry.path
+                is_dir = entry.is_dir()
+
+                # Check if it's a backup file
+                if not (file.startswith("backup_") and (file.endswith(".zip") or is_dir)):
                     continue
 
+                stat = entry.stat()
                 backup_info = {
                     "name": file,
                     "path": file_path,
-                    "size": self._get_file_size(file_path),
-                    "created": datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat(),
-                    "type": "directory" if os.path.isdir(file_path) else "compressed"
+                    "size": self._format_size(stat.st_size),
+                    "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    "type": "directory" if is_dir else "compressed"
                 }
 
                 # Load metadata if available
-                metadata_path = os.path.join(file_path, "metadata.json") if os.path.isdir(file_path) else None
+                if is_dir:
+                    metadata_path = os.path.join(file_path, "metadata.json")
+                else:
+                    metadata_path = file_path + METADATA_SIDECAR_SUFFIX
                 if metadata_path and os.path.exists(metadata_path):
                     try:
-                        with open(metadata_path, 'r', encoding='utf-8') as f:
-                            backup_info["metadata"] = json.load(f)
+                        with open(metadata_path, 'rb') as f:
+                            backup_info["metadata"] = _loads(f.read())
                     except Exception as e:
                         logger.error(f"Error loading metadata for {file}: {e}")
+                if "metadata" not in backup_info:
+                    complete = False
 
-                backups.append(backup_info)
-
-        except Exception as e:
-            logger.error(f"Error listing backups: {e}")
+                backups.append((_backup_org(file), backup_info))
 
         # Sort by creation date (newest first)
-        backups.sort(key=lambda x: x['created'], reverse=True)
+        backups.sort(key=lambda x: x[1]['created'], reverse=True)
+        # A backup still being written gets its metadata.json inside its own directory,
+        # which doesn't touch backup_dir's mtime, so such listings are not cached
+        self._listing_cache = (mtime, backups) if complete else None
         return backups
 
-    def restore_backup(self, backup_path: str, db: Session) -> Dict:
-        """Restore data from backup"""
+    def restore_backup(self, backup_path: str, db: Session, durable: bool = True) -> Dict:
+        """Restore data from backup.
+
+        With durable=False every table is restored in a single transaction with
+        one commit at the end (and synchronous_commit off on PostgreSQL): faster,
+        but a crash right after returning may lose the restore.
+        """
         try:
-            # Extract if compressed
+            # Read compressed backups in place instead of extracting them
             if backup_path.endswith(".zip"):
-                extract_path = backup_path[:-4] + "_extracted"
                 with zipfile.ZipFile(backup_path, 'r') as zipf:
-                    zipf.extractall(extract_path)
-                backup_path = extract_path
-
-            # Load metadata
-            metadata_path = os.path.join(backup_path, "metadata.json")
-            if not os.path.exists(metadata_path):
-                return {"success": False, "error": "Metadata not found"}
-
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-
-            # Restore database
-            db_path = os.path.join(backup_path, "database")
-            if os.path.exists(db_path):
-                restore_result = self._restore_database(db_path, db)
-                if not restore_result["success"]:
-                    return restore_result
-
-            # Restore files
-            files_path = os.path.join(backup_path, "files")
-            if os.path.exists(files_path):
-                self._restore_files(files_path)
-
-            # Cleanup extracted folder if it was extracted
-            if extract_path:
-                shutil.rmtree(extract_path)
-
-            logger.info(f"Backup restored successfully from {backup_path}")
-            
-            return {
-                "success": True,
-                "restored_at": datetime.now().isoformat(),
-                "metadata": metadata
-            }
+                    return self._restore_from(_ZipSource(zipf), backup_path, db, durable)
+            return self._restore_from(_DirectorySource(backup_path), backup_path, db, durable)
 
         except Exception as e:
             logger.error(f"Error restoring backup: {e}")
             return {"success": False, "error": str(e)}
 
-    def _restore_database(self, db_path: str, db: Session) -> Dict:
+    def _restore_from(self, source, backup_path: str, db: Session, durable: bool = True) -> Dict:
+        """Restore database and files from a backup source"""
+        # Load metadata
+        raw_metadata = source.read("metadata.json")
+        if raw_metadata is None:
+            return {"success": False, "error": "Metadata not found"}
+        metadata = _loads(raw_metadata)
+
+        # Restore database
+        restore_result = self._restore_database(source, db, durable)
+        if not restore_result["success"]:
+            return restore_result
+
+        # Restore files
+        self._restore_files(source)
+
+        logger.info(f"Backup restored successfully from {backup_path}")
+
+        return {
+            "success": True,
+            "restored_at": datetime.now().isoformat(),
+            "metadata": metadata
+        }
+
+    def _restore_database(self, source, db: Session, durable: bool = True) -> Dict:
         """Restore database from JSON files"""
         try:
+            if not durable and db.get_bind().dialect.name == "postgresql":
+                db.execute(sa.text("SET LOCAL synchronous_commit = off"))
+
             tables = {
                 'organizations': Organization,
                 'users': User,
@@ -386,35 +690,39 @@ class BackupService:
             }
 
             for table_name, model in tables.items():
-                file_path = os.path.join(db_path, f"{table_name}.json")
-                if not os.path.exists(file_path):
+                raw = source.read(f"database/{table_name}.json")
+                if raw is None:
                     continue
 
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = _loads(raw)
 
                 # Clear existing data (be careful with this in production)
-                db.query(model).delete()
+                table = model.__table__
+                db.execute(sa.delete(table))
 
-                # Insert restored data
+                # Convert datetime strings back, only on the table's date/datetime columns
+                datetime_columns = [c.name for c in table.columns if isinstance(c.type, sa.DateTime)]
+                date_columns = [c.name for c in table.columns if isinstance(c.type, sa.Date)]
                 for record_data in data:
-                    try:
-                        # Convert datetime strings back to datetime objects
-                        for key, value in record_data.items():
-                            if isinstance(value, str) and value.endswith('Z'):
-                                try:
-                                    record_data[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                                except:
-                                    pass
-                        
-                        record = model(**record_data)
-                        db.add(record)
-
-                    except Exception as e:
-                        logger.error(f"Error restoring record in {table_name}: {e}")
+                    for column in datetime_columns:
+                        value = record_data.get(column)
+                        if value is not None:
+                            record_data[column] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                    for column in date_columns:
+                        value = record_data.get(column)
+                        if value is not None:
+                            record_data[column] = date.fromisoformat(value)
+
+                # Insert restored data in executemany batches
+                for start in range(0, len(data), RESTORE_BATCH_SIZE):
+                    db.execute(sa.insert(table), data[start:start + RESTORE_BATCH_SIZE])
+
+                if durable:
+                    db.commit()
+                logger.info(f"Restored {len(data)} records to {table_name}")
 
+            if not durable:
                 db.commit()
-                logger.info(f"Restored {len(data)} records to {table_name}")
 
             return {"success": True}
 
@@ -423,16 +731,11 @@ class BackupService:
             db.rollback()
             return {"success": False, "error": str(e)}
 
-    def _restore_files(self, files_path: str):
+    def _restore_files(self, source):
         """Restore files from backup"""
         try:
             uploads_dir = os.getenv("UPLOAD_DIR", "uploads")
-            backup_uploads = os.path.join(files_path, "uploads")
-            
-            if os.path.exists(backup_uploads):
-                if os.path.exists(uploads_dir):
-                    shutil.rmtree(uploads_dir)
-                shutil.copytree(backup_uploads, uploads_dir)
+            if source.extract_tree("files/uploads", uploads_dir):
                 logger.info("Files restored successfully")
 
         except Exception as e:
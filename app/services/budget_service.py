@@ -1,16 +1,32 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.models.budget import Budget, BudgetTransaction, BudgetAlert, ExpenseRequest, ROIAnalysis, BudgetStatus, BudgetType
 from app.models.expense import Expense
 from app.models.project import Project
 from app.models.user import User
 import logging
-import json
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Below this many revenue streams the numpy setup costs more than a plain sum
+ROI_VECTORIZE_MIN_STREAMS = 64
+
+
+def _insert_ignoring_conflicts(db: Session, model):
+    """INSERT ... ON CONFLICT DO NOTHING on the dialects that support it; plain INSERT elsewhere"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite_insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
 class BudgetService:
     def __init__(self):
         pass
@@ -44,15 +60,15 @@ class BudgetService:
             
             # Check for overlapping budgets for same project/period
             if project_id:
-                existing = db.query(Budget).filter(
-                    Budget.organization_id == organization_id,
-                    Budget.project_id == project_id,
-                    Budget.status != BudgetStatus.COMPLETED,
-                    or_(
-                        and_(Budget.start_date <= start_date, Budget.end_date >= start_date),
-                        and_(Budget.start_date <= end_date, Budget.end_date >= end_date),
-                        and_(Budget.start_date >= start_date, Budget.end_date <= end_date)
-                    )
+                # Two ranges overlap iff each starts before the other ends
+                existing = db.execute(
+                    select(Budget.id, Budget.name).where(
+                        Budget.organization_id == organization_id,
+                        Budget.project_id == project_id,
+                        Budget.status != BudgetStatus.COMPLETED,
+                        Budget.start_date <= end_date,
+                        Budget.end_date >= start_date
+                    ).limit(1)
                 ).first()
                 
                 if existing:
@@ -61,29 +77,28 @@ class BudgetService:
                         "error": f"Project already has an active budget: {existing.name}"
                     }
             
-            # Create budget
-            budget = Budget(
-                organization_id=organization_id,
-                name=name,
-                description=description,
-                type=budget_type,
-                total_amount=total_amount,
-                remaining_amount=total_amount,
-                start_date=start_date,
-                end_date=end_date,
-                project_id=project_id,
-                warning_threshold=warning_threshold,
-                critical_threshold=critical_threshold,
-                requires_approval=requires_approval,
-                approver_id=approver_id,
-                max_single_expense=max_single_expense,
-                created_by=created_by,
-                status=BudgetStatus.ACTIVE
-            )
-            
-            db.add(budget)
+            # Create budget (single Core INSERT; RETURNING avoids a refresh SELECT)
+            budget = db.execute(
+                insert(Budget).values(
+                    organization_id=organization_id,
+                    name=name,
+                    description=description,
+                    type=budget_type,
+                    total_amount=total_amount,
+                    remaining_amount=total_amount,
+                    start_date=start_date,
+                    end_date=end_date,
+                    project_id=project_id,
+                    warning_threshold=warning_threshold,
+                    critical_threshold=critical_threshold,
+                    requires_approval=requires_approval,
+                    approver_id=approver_id,
+                    max_single_expense=max_single_expense,
+                    created_by=created_by,
+                    status=BudgetStatus.ACTIVE
+                ).returning(Budget.id, Budget.name, Budget.type, Budget.status)
+            ).one()
             db.commit()
-            db.refresh(budget)
             
             return {
                 "success": True,
@@ -91,9 +106,10 @@ class BudgetService:
                     "id": budget.id,
                     "name": budget.name,
                     "type": budget.type.value,
-                    "total_amount": budget.total_amount,
-                    "remaining_amount": budget.remaining_amount,
-                    "utilization_percentage": budget.utilization_percentage,
+                    "total_amount": float(total_amount),
+                    "remaining_amount": float(total_amount),
+                    # spent_amount is 0 on creation
+                    "utilization_percentage": 0.0,
                     "status": budget.status.value
                 }
             }
@@ -107,68 +123,134 @@ class BudgetService:
             }
     
     def update_budget_spending(self, db: Session, budget_id: int, expense_amount: float, expense_id: int = None) -> Dict:
-        """Update budget spending when expense is created"""
+        """Update budget spending when expense is created; retries with the same expense_id are no-ops"""
         try:
-            budget = db.query(Budget).filter(Budget.id == budget_id).first()
+            now = datetime.utcnow()
+            
+            # Record the expense transaction first: the unique (budget_id, expense_id) index
+            # turns a retried charge into an empty insert, and then spending is left untouched
+            if expense_id is not None:
+                recorded = db.execute(
+                    _insert_ignoring_conflicts(db, BudgetTransaction).from_select(
+                        ["budget_id", "organization_id", "amount", "transaction_type", "expense_id", "created_by", "created_at"],
+                        select(
+                            Budget.id,
+                            Budget.organization_id,
+                            literal(expense_amount, BudgetTransaction.amount.type),
+                            literal("expense", BudgetTransaction.transaction_type.type),
+                            literal(expense_id, BudgetTransaction.expense_id.type),
+                            Budget.created_by,
+                            literal(now, BudgetTransaction.created_at.type)
+                        ).where(Budget.id == budget_id)
+                    ).returning(BudgetTransaction.id)
+                ).first()
+                if not recorded:
+                    if db.execute(select(Budget.id).where(Budget.id == budget_id)).first() is None:
+                        return {
+                            "success": False,
+                            "error": "Budget not found"
+                        }
+                    return {
+                        "success": True,
+                        "duplicate": True,
+                        "alerts_created": []
+                    }
+            
+            # Atomic server-side increment; RETURNING gives the values the alert checks need
+            new_spent_expr = func.coalesce(Budget.spent_amount, 0) + expense_amount
+            budget = db.execute(
+                update(Budget).where(Budget.id == budget_id).values(
+                    spent_amount=new_spent_expr,
+                    remaining_amount=Budget.total_amount - new_spent_expr,
+                    status=case(
+                        (new_spent_expr > Budget.total_amount, literal(BudgetStatus.EXCEEDED, Budget.status.type)),
+                        else_=Budget.status
+                    ),
+                    # Stamped the first time spending reaches the critical threshold, then kept
+                    critical_exceeded_at=func.coalesce(
+                        Budget.critical_exceeded_at,
+                        case(
+                            (
+                                (Budget.total_amount > 0)
+                                & (new_spent_expr * 100 >= Budget.critical_threshold * Budget.total_amount),
+                                now
+                            ),
+                            else_=None
+                        )
+                    ),
+                    updated_at=now
+                ).returning(
+                    Budget.organization_id,
+                    Budget.created_by,
+                    Budget.spent_amount,
+                    Budget.total_amount,
+                    Budget.warning_threshold,
+                    Budget.critical_threshold,
+                    Budget.critical_exceeded_at,
+                    Budget.status
+                )
+            ).first()
             if not budget:
                 return {
                     "success": False,
                     "error": "Budget not found"
                 }
             
-            # Update spent amount
-            old_spent = budget.spent_amount
-            budget.spent_amount += expense_amount
-            budget.remaining_amount = budget.total_amount - budget.spent_amount
-            budget.updated_at = datetime.utcnow()
-            
-            # Create transaction record
-            transaction = BudgetTransaction(
-                budget_id=budget_id,
-                organization_id=budget.organization_id,
-                amount=expense_amount,
-                transaction_type="expense",
-                expense_id=expense_id,
-                created_by=budget.created_by
+            new_spent = float(budget.spent_amount)
+            old_spent = new_spent - expense_amount
+            if budget.total_amount == 0:
+                old_utilization = utilization = 0
+            else:
+                old_utilization = old_spent / budget.total_amount * 100
+                utilization = new_spent / budget.total_amount * 100
+            
+            # Check thresholds and create alerts when this expense crosses one.
+            # A budget stamped critical by an earlier expense has no threshold left to cross.
+            alert_rows = []
+            already_critical = (
+                budget.critical_exceeded_at is not None and budget.critical_exceeded_at != now
             )
-            db.add(transaction)
             
-            # Check thresholds and create alerts
-            alerts_created = []
-            
-            if budget.utilization_percentage >= budget.critical_threshold and not budget.is_critical_threshold_exceeded:
-                alert = BudgetAlert(
+            if not already_critical:
+                if old_utilization < budget.critical_threshold <= utilization:
+                    alert_rows.append({
+                        "budget_id": budget_id,
+                        "organization_id": budget.organization_id,
+                        "alert_type": "critical",
+                        "threshold_percentage": budget.critical_threshold,
+                        "current_percentage": utilization
+                    })
+            
+                elif old_utilization < budget.warning_threshold <= utilization:
+                    alert_rows.append({
+                        "budget_id": budget_id,
+                        "organization_id": budget.organization_id,
+                        "alert_type": "warning",
+                        "threshold_percentage": budget.warning_threshold,
+                        "current_percentage": utilization
+                    })
+            
+            # Create transaction record (already recorded above when tied to an expense)
+            if expense_id is None:
+                db.execute(insert(BudgetTransaction).values(
                     budget_id=budget_id,
                     organization_id=budget.organization_id,
-                    alert_type="critical",
-                    threshold_percentage=budget.critical_threshold,
-                    current_percentage=budget.utilization_percentage
-                )
-                db.add(alert)
-                alerts_created.append("critical")
-                
-                # Update status if exceeded
-                if budget.is_over_budget:
-                    budget.status = BudgetStatus.EXCEEDED
-            
-            elif budget.utilization_percentage >= budget.warning_threshold and not budget.is_warning_threshold_exceeded:
-                alert = BudgetAlert(
-                    budget_id=budget_id,
-                    organization_id=budget.organization_id,
-                    alert_type="warning",
-                    threshold_percentage=budget.warning_threshold,
-                    current_percentage=budget.utilization_percentage
-                )
-                db.add(alert)
-                alerts_created.append("warning")
+                    amount=expense_amount,
+                    transaction_type="expense",
+                    created_by=budget.created_by,
+                    created_at=now
+                ))
+            if alert_rows:
+                db.execute(insert(BudgetAlert), alert_rows)
+            alerts_created = [row["alert_type"] for row in alert_rows]
             
             db.commit()
             
             return {
                 "success": True,
                 "old_spent": old_spent,
-                "new_spent": budget.spent_amount,
-                "utilization_percentage": budget.utilization_percentage,
+                "new_spent": new_spent,
+                "utilization_percentage": utilization,
                 "alerts_created": alerts_created,
                 "status": budget.status.value
             }
@@ -184,30 +266,48 @@ class BudgetService:
     def get_budget_status(self, db: Session, budget_id: int) -> Dict:
         """Get current budget status and alerts"""
         try:
-            budget = db.query(Budget).filter(Budget.id == budget_id).first()
+            budget = db.execute(
+                select(Budget).where(Budget.id == budget_id).options(raiseload("*"))
+            ).scalar_one_or_none()
             if not budget:
                 return {
                     "success": False,
                     "error": "Budget not found"
                 }
             
-            # Get recent transactions
-            recent_transactions = db.query(BudgetTransaction).filter(
-                BudgetTransaction.budget_id == budget_id
-            ).order_by(BudgetTransaction.created_at.desc()).limit(10).all()
-            
-            # Get active alerts
-            active_alerts = db.query(BudgetAlert).filter(
-                BudgetAlert.budget_id == budget_id,
-                BudgetAlert.is_acknowledged == False
-            ).order_by(BudgetAlert.created_at.desc()).all()
+            # Get active alerts (only the serialized columns, newest first)
+            active_alerts = db.execute(
+                select(
+                    BudgetAlert.id,
+                    BudgetAlert.alert_type,
+                    BudgetAlert.threshold_percentage,
+                    BudgetAlert.current_percentage,
+                    BudgetAlert.created_at
+                ).where(
+                    BudgetAlert.budget_id == budget_id,
+                    BudgetAlert.is_acknowledged == False
+                ).order_by(BudgetAlert.created_at.desc())
+            ).all()
             
-            # Calculate spending trend
+            # Get recent transactions and the 30-day spending trend in one query;
+            # the window sum runs over all of the budget's rows before LIMIT applies
             thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            recent_spending = db.query(func.sum(BudgetTransaction.amount)).filter(
-                BudgetTransaction.budget_id == budget_id,
-                BudgetTransaction.created_at >= thirty_days_ago
-            ).scalar() or 0
+            recent_sum = func.sum(
+                case((BudgetTransaction.created_at >= thirty_days_ago, BudgetTransaction.amount), else_=0)
+            ).over().label("recent_spending")
+            recent_transactions = db.execute(
+                select(
+                    BudgetTransaction.id,
+                    BudgetTransaction.amount,
+                    BudgetTransaction.transaction_type,
+                    BudgetTransaction.description,
+                    BudgetTransaction.created_at,
+                    recent_sum
+                ).where(
+                    BudgetTransaction.budget_id == budget_id
+                ).order_by(BudgetTransaction.created_at.desc()).limit(10)
+            ).all()
+            recent_spending = (recent_transactions[0].recent_spending if recent_transactions else 0) or 0
             
             return {
                 "success": True,
@@ -217,13 +317,10 @@ class BudgetService:
                     "total_amount": budget.total_amount,
                     "spent_amount": budget.spent_amount,
                     "remaining_amount": budget.remaining_amount,
-                    "utilization_percentage": budget.utilization_percentage,
                     "status": budget.status.value,
                     "warning_threshold": budget.warning_threshold,
                     "critical_threshold": budget.critical_threshold,
-                    "is_warning_exceeded": budget.is_warning_threshold_exceeded,
-                    "is_critical_exceeded": budget.is_critical_threshold_exceeded,
-                    "is_over_budget": budget.is_over_budget
+                    **budget.utilization_metrics()
                 },
                 "recent_transactions": [
                     {
@@ -273,11 +370,19 @@ class BudgetService:
     ) -> Dict:
         """Create an expense request for approval"""
         try:
-            # Validate budget if specified
+            # Validate budget if specified (only the columns the checks need, share-locked)
+            budget = None
             if budget_id:
-                budget = db.query(Budget).filter(
-                    Budget.id == budget_id,
-                    Budget.organization_id == organization_id
+                budget = db.execute(
+                    select(
+                        Budget.max_single_expense,
+                        Budget.remaining_amount,
+                        Budget.requires_approval,
+                        Budget.approver_id
+                    ).where(
+                        Budget.id == budget_id,
+                        Budget.organization_id == organization_id
+                    ).with_for_update(read=True)
                 ).first()
                 
                 if not budget:
@@ -300,25 +405,24 @@ class BudgetService:
                     }
             
             # Create expense request
-            expense_request = ExpenseRequest(
-                organization_id=organization_id,
-                title=title,
-                description=description,
-                amount=amount,
-                category=category,
-                budget_id=budget_id,
-                requested_by=requested_by,
-                receipt_url=receipt_url,
-                supporting_documents=json.dumps(supporting_documents or []),
-                status="pending"
-            )
-            
-            db.add(expense_request)
+            expense_request = db.execute(
+                insert(ExpenseRequest).values(
+                    organization_id=organization_id,
+                    title=title,
+                    description=description,
+                    amount=amount,
+                    category=category,
+                    budget_id=budget_id,
+                    requested_by=requested_by,
+                    receipt_url=receipt_url,
+                    supporting_documents=supporting_documents or [],
+                    status="pending"
+                ).returning(ExpenseRequest.id, ExpenseRequest.created_at)
+            ).one()
             db.commit()
-            db.refresh(expense_request)
             
             # Send notification to approver if budget requires approval
-            if budget_id and budget.requires_approval and budget.approver_id:
+            if budget and budget.requires_approval and budget.approver_id:
                 # This would integrate with notification service
                 logger.info(f"Expense request {expense_request.id} requires approval by user {budget.approver_id}")
             
@@ -326,9 +430,9 @@ class BudgetService:
                 "success": True,
                 "expense_request": {
                     "id": expense_request.id,
-                    "title": expense_request.title,
-                    "amount": expense_request.amount,
-                    "status": expense_request.status,
+                    "title": title,
+                    "amount": amount,
+                    "status": "pending",
                     "created_at": expense_request.created_at.isoformat()
                 }
             }
@@ -351,26 +455,42 @@ class BudgetService:
     ) -> Dict:
         """Approve or reject an expense request"""
         try:
-            expense_request = db.query(ExpenseRequest).filter(ExpenseRequest.id == request_id).first()
-            if not expense_request:
-                return {
-                    "success": False,
-                    "error": "Expense request not found"
-                }
+            now = datetime.utcnow()
+            
+            # Transition pending -> approved/rejected atomically; a concurrent or
+            # repeated approval matches no row instead of double-applying
+            expense_request = db.execute(
+                update(ExpenseRequest).where(
+                    ExpenseRequest.id == request_id,
+                    ExpenseRequest.status == "pending"
+                ).values(
+                    status="approved" if approved else "rejected",
+                    approved_by=approved_by,
+                    approved_at=now,
+                    rejection_reason=rejection_reason,
+                    updated_at=now
+                ).returning(
+                    ExpenseRequest.organization_id,
+                    ExpenseRequest.amount,
+                    ExpenseRequest.description,
+                    ExpenseRequest.category,
+                    ExpenseRequest.receipt_url,
+                    ExpenseRequest.requested_by,
+                    ExpenseRequest.budget_id,
+                    ExpenseRequest.status,
+                    ExpenseRequest.approved_at
+                )
+            ).first()
             
-            if expense_request.status != "pending":
+            if not expense_request:
+                exists = db.execute(
+                    select(ExpenseRequest.id).where(ExpenseRequest.id == request_id)
+                ).first()
                 return {
                     "success": False,
-                    "error": "Expense request is not pending"
+                    "error": "Expense request is not pending" if exists else "Expense request not found"
                 }
             
-            # Update request
-            expense_request.status = "approved" if approved else "rejected"
-            expense_request.approved_by = approved_by
-            expense_request.approved_at = datetime.utcnow()
-            expense_request.rejection_reason = rejection_reason
-            expense_request.updated_at = datetime.utcnow()
-            
             # If approved, create the actual expense
             if approved:
                 expense = Expense(
@@ -381,7 +501,7 @@ class BudgetService:
                     receipt_url=expense_request.receipt_url,
                     project_id=None,  # Would be set from budget if needed
                     user_id=expense_request.requested_by,
-                    created_at=datetime.utcnow()
+                    created_at=now
                 )
                 
                 db.add(expense)
@@ -440,8 +560,15 @@ class BudgetService:
                     "error": "Project not found"
                 }
             
-            # Calculate total return from revenue streams
-            total_return = sum(stream.get("amount", 0) for stream in revenue_streams)
+            # Calculate total return from revenue streams (vectorized for large models)
+            if len(revenue_streams) >= ROI_VECTORIZE_MIN_STREAMS:
+                total_return = float(np.fromiter(
+                    (stream.get("amount", 0) for stream in revenue_streams),
+                    dtype=np.float64,
+                    count=len(revenue_streams)
+                ).sum())
+            else:
+                total_return = sum(stream.get("amount", 0) for stream in revenue_streams)
             
             # Calculate ROI percentage
             roi_percentage = ((total_return - total_investment) / total_investment * 100) if total_investment > 0 else 0
@@ -450,35 +577,34 @@ class BudgetService:
             monthly_return = total_return / 12  # Simplified calculation
             payback_period_months = int(total_investment / monthly_return) if monthly_return > 0 else None
             
-            # Create ROI analysis record
-            roi_analysis = ROIAnalysis(
-                organization_id=organization_id,
-                project_id=project_id,
-                total_investment=total_investment,
-                total_return=total_return,
-                roi_percentage=roi_percentage,
-                payback_period_months=payback_period_months,
-                analysis_start_date=analysis_start_date,
-                analysis_end_date=analysis_end_date,
-                revenue_streams=json.dumps(revenue_streams),
-                cost_breakdown=json.dumps(cost_breakdown),
-                assumptions=assumptions,
-                status="active",
-                created_by=created_by
-            )
-            
-            db.add(roi_analysis)
+            # Create ROI analysis record (single Core INSERT; RETURNING gives the id)
+            roi_analysis = db.execute(
+                insert(ROIAnalysis).values(
+                    organization_id=organization_id,
+                    project_id=project_id,
+                    total_investment=total_investment,
+                    total_return=total_return,
+                    roi_percentage=roi_percentage,
+                    payback_period_months=payback_period_months,
+                    analysis_start_date=analysis_start_date,
+                    analysis_end_date=analysis_end_date,
+                    revenue_streams=revenue_streams,
+                    cost_breakdown=cost_breakdown,
+                    assumptions=assumptions,
+                    status="active",
+                    created_by=created_by
+                ).returning(ROIAnalysis.id, ROIAnalysis.status)
+            ).one()
             db.commit()
-            db.refresh(roi_analysis)
             
             return {
                 "success": True,
                 "roi_analysis": {
                     "id": roi_analysis.id,
-                    "total_investment": roi_analysis.total_investment,
-                    "total_return": roi_analysis.total_return,
-                    "roi_percentage": roi_analysis.roi_percentage,
-                    "payback_period_months": roi_analysis.payback_period_months,
+                    "total_investment": float(total_investment),
+                    "total_return": float(total_return),
+                    "roi_percentage": float(roi_percentage),
+                    "payback_period_months": payback_period_months,
                     "status": roi_analysis.status
                 },
                 "metrics": {
@@ -500,49 +626,64 @@ class BudgetService:
     def get_budget_dashboard(self, db: Session, organization_id: int) -> Dict:
         """Get budget dashboard data"""
         try:
-            # Get all budgets for organization
-            budgets = db.query(Budget).filter(
-                Budget.organization_id == organization_id
-            ).all()
-            
+            org_filter = Budget.organization_id == organization_id
+
             # Calculate totals
-            total_budgeted = sum(b.total_amount for b in budgets)
-            total_spent = sum(b.spent_amount for b in budgets)
-            total_remaining = sum(b.remaining_amount for b in budgets)
+            total_budgets, total_budgeted, total_spent, total_remaining = db.execute(
+                select(
+                    func.count(Budget.id),
+                    func.coalesce(func.sum(Budget.total_amount), 0),
+                    func.coalesce(func.sum(Budget.spent_amount), 0),
+                    func.coalesce(func.sum(Budget.remaining_amount), 0)
+                ).where(org_filter)
+            ).one()
             
             # Get budgets by status
-            budgets_by_status = {}
-            for status in BudgetStatus:
-                budgets_by_status[status.value] = len([b for b in budgets if b.status == status])
-            
-            # Get active alerts
-            active_alerts = db.query(BudgetAlert).join(Budget).filter(
-                Budget.organization_id == organization_id,
-                BudgetAlert.is_acknowledged == False
-            ).count()
-            
-            # Get pending expense requests
-            pending_requests = db.query(ExpenseRequest).filter(
-                ExpenseRequest.organization_id == organization_id,
-                ExpenseRequest.status == "pending"
-            ).count()
-            
-            # Get top budgets by utilization
-            budget_utilizations = [
+            budgets_by_status = {status.value: 0 for status in BudgetStatus}
+            for status, count in db.execute(
+                select(Budget.status, func.count(Budget.id)).where(org_filter).group_by(Budget.status)
+            ):
+                if status is not None:
+                    budgets_by_status[status.value] = count
+            
+            # Get active alerts and pending expense requests in one round-trip
+            active_alerts, pending_requests = db.execute(
+                select(
+                    select(func.count(BudgetAlert.id)).join(Budget, BudgetAlert.budget_id == Budget.id).where(
+                        org_filter,
+                        BudgetAlert.is_acknowledged == False
+                    ).scalar_subquery(),
+                    select(func.count(ExpenseRequest.id)).where(
+                        ExpenseRequest.organization_id == organization_id,
+                        ExpenseRequest.status == "pending"
+                    ).scalar_subquery()
+                )
+            ).one()
+            
+            # Get top budgets by utilization (ranked and limited in SQL)
+            utilization = case(
+                (Budget.total_amount == 0, 0.0),
+                else_=Budget.spent_amount / Budget.total_amount * 100
+            ).label("utilization")
+            top_utilizations = [
                 {
-                    "id": b.id,
-                    "name": b.name,
-                    "utilization": b.utilization_percentage,
-                    "status": b.status.value
+                    "id": row.id,
+                    "name": row.name,
+                    "utilization": row.utilization,
+                    "status": row.status.value
                 }
-                for b in budgets
+                for row in db.execute(
+                    select(Budget.id, Budget.name, utilization, Budget.status)
+                    .where(org_filter)
+                    .order_by(utilization.desc(), Budget.id)
+                    .limit(10)
+                )
             ]
-            budget_utilizations.sort(key=lambda x: x["utilization"], reverse=True)
             
             return {
                 "success": True,
                 "summary": {
-                    "total_budgets": len(budgets),
+                    "total_budgets": total_budgets,
                     "total_budgeted": total_budgeted,
                     "total_spent": total_spent,
                     "total_remaining": total_remaining,
@@ -553,7 +694,7 @@ class BudgetService:
                     "active_count": active_alerts,
                     "pending_requests": pending_requests
                 },
-                "top_utilizations": budget_utilizations[:10]
+                "top_utilizations": top_utilizations
             }
             
         except Exception as e:
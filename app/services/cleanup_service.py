@@ -1,9 +1,12 @@
 import os
 import shutil
+import stat
 import tempfile
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.core.database import engine
 from app.models import Expense, Attendance, User, Project, Client
@@ -12,6 +15,125 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# Directory names whose files cleanup_temp_files treats as app temp files
+_APP_TEMP_DIRS = frozenset({"temp", "tmp", "cache", ".cache", "__pycache__"})
+
+# Directories never descended into when scanning the project tree for app temp dirs
+_EXCLUDE_DIRS = frozenset({"node_modules", "venv", ".git"})
+
+# Extensions cleanup_old_logs treats as log files
+_LOG_EXTS = frozenset({".log", ".out", ".err"})
+
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+# Rows removed per DELETE statement when purging old records
+DB_DELETE_BATCH_SIZE = 10000
+
+
+# Unlink relative to an open directory fd where the platform allows it
+_DIR_FD_UNLINK = os.unlink in os.supports_dir_fd and os.scandir in os.supports_fd
+
+
+class _FoundFile(NamedTuple):
+    """A file yielded by _iter_files, with its lstat and open parent directory fd"""
+    path: str
+    name: str
+    st: os.stat_result
+    dir_fd: Optional[int]
+
+    def remove(self) -> None:
+        """Delete the file without resolving its full path again"""
+        if self.dir_fd is not None:
+            os.unlink(self.name, dir_fd=self.dir_fd)
+        else:
+            os.remove(self.path)
+
+
+def _skip_project_dir(name: str) -> bool:
+    """Skip hidden directories and common non-temp directories"""
+    return name[0] == '.' or name in _EXCLUDE_DIRS
+
+
+def _is_log_file(name: str) -> bool:
+    """Whether name carries one of the log extensions"""
+    dot = name.rfind('.')
+    return dot != -1 and name[dot:] in _LOG_EXTS
+
+
+def _iter_files(
+    root: str,
+    prune: Optional[Callable[[str], bool]] = None,
+    one_file_system: bool = False,
+    only_in: Optional[frozenset] = None
+) -> Iterator[_FoundFile]:
+    """Yield every file under root using os.scandir.
+
+    Each file costs a single lstat; directories rejected by prune(name) are not
+    descended into, nor, with one_file_system, directories on another device
+    (mount points). With only_in, files are only yielded (and stat'ed) from
+    directories whose name is in that set. Unreadable directories and vanished
+    files are skipped, as os.walk does. Each directory is scanned through an
+    open fd that stays open while its files are yielded, so removals skip the
+    path walk from root.
+    """
+    try:
+        root_dev = os.stat(root).st_dev if one_file_system else None
+    except OSError:
+        return
+    stack = [root]
+    while stack:
+        dir_path = stack.pop()
+        dir_fd = None
+        yield_files = only_in is None or os.path.basename(dir_path) in only_in
+        try:
+            if _DIR_FD_UNLINK:
+                dir_fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+            with os.scandir(dir_path if dir_fd is None else dir_fd) as entries:
+                for entry in entries:
+                    path = os.path.join(dir_path, entry.name)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (prune is None or not prune(entry.name)) and (
+                                root_dev is None or entry.stat(follow_symlinks=False).st_dev == root_dev
+                            ):
+                                stack.append(path)
+                            continue
+                        if not yield_files:
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    yield _FoundFile(path, entry.name, st, dir_fd)
+        except OSError:
+            continue
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+
+def _walk_old_files(
+    roots: List[str],
+    cutoff_ts: Optional[float] = None,
+    name_filter: Optional[Callable[[str], bool]] = None,
+    regular_only: bool = False,
+    **scan_options
+) -> Iterator[_FoundFile]:
+    """Yield the files under roots last modified before cutoff_ts and accepted by name_filter.
+
+    No cutoff means any age; regular_only skips sockets, FIFOs and symlinks.
+    scan_options are passed through to _iter_files.
+    """
+    for root in roots:
+        for found in _iter_files(root, **scan_options):
+            if name_filter is not None and not name_filter(found.name):
+                continue
+            if cutoff_ts is not None and found.st.st_mtime >= cutoff_ts:
+                continue
+            if regular_only and not stat.S_ISREG(found.st.st_mode):
+                continue
+            yield found
+
+
 class CleanupService:
     def __init__(self):
         self.cleanup_interval = int(os.getenv("CLEANUP_INTERVAL_HOURS", "24"))  # hours
@@ -21,6 +143,7 @@ class CleanupService:
         self.upload_cleanup_enabled = os.getenv("UPLOAD_CLEANUP_ENABLED", "true").lower() == "true"
         self.running = False
         self.thread = None
+        self._stop = threading.Event()
 
     def start_scheduler(self):
         """Start the automatic cleanup scheduler"""
@@ -28,6 +151,7 @@ class CleanupService:
             return
         
         self.running = True
+        self._stop.clear()
         self.thread = threading.Thread(target=self._scheduler_loop, daemon=True)
         self.thread.start()
         logger.info("Cleanup scheduler started")
@@ -35,6 +159,7 @@ class CleanupService:
     def stop_scheduler(self):
         """Stop the automatic cleanup scheduler"""
         self.running = False
+        self._stop.set()  # Wake the scheduler loop so join() returns promptly
         if self.thread:
             self.thread.join()
         logger.info("Cleanup scheduler stopped")
@@ -44,11 +169,13 @@ class CleanupService:
         while self.running:
             try:
                 self.perform_cleanup()
-                # Sleep for cleanup interval
-                time.sleep(self.cleanup_interval * 3600)
+                # Wait for cleanup interval (returns early on stop)
+                if self._stop.wait(self.cleanup_interval * 3600):
+                    break
             except Exception as e:
                 logger.error(f"Error in cleanup scheduler: {e}")
-                time.sleep(3600)  # Wait 1 hour before retrying
+                if self._stop.wait(3600):  # Wait 1 hour before retrying
+                    break
 
     def perform_cleanup(self, db: Session = None) -> Dict:
         """Perform all cleanup operations"""
@@ -59,22 +186,21 @@ class CleanupService:
         }
 
         try:
-            # Clean temporary files
-            temp_results = self.cleanup_temp_files()
-            results["operations"]["temp_files"] = temp_results
-
-            # Clean old logs
-            log_results = self.cleanup_old_logs()
-            results["operations"]["logs"] = log_results
-
-            # Clean orphaned uploads
-            if self.upload_cleanup_enabled:
-                upload_results = self.cleanup_orphaned_uploads(db)
-                results["operations"]["uploads"] = upload_results
-
-            # Clean old backups
-            backup_results = self.cleanup_old_backups()
-            results["operations"]["backups"] = backup_results
+            # Temp, log and backup cleanups touch disjoint trees and are I/O-bound:
+            # run them concurrently while the uploads cleanup uses the session here
+            with ThreadPoolExecutor(max_workers=3, thread_name_prefix="cleanup") as executor:
+                temp_future = executor.submit(self.cleanup_temp_files)
+                log_future = executor.submit(self.cleanup_old_logs)
+                backup_future = executor.submit(self.cleanup_old_backups)
+
+                # Clean orphaned uploads
+                upload_results = self.cleanup_orphaned_uploads(db) if self.upload_cleanup_enabled else None
+
+                results["operations"]["temp_files"] = temp_future.result()
+                results["operations"]["logs"] = log_future.result()
+                if upload_results is not None:
+                    results["operations"]["uploads"] = upload_results
+                results["operations"]["backups"] = backup_future.result()
 
             # Clean database records
             if db:
@@ -105,49 +231,20 @@ class CleanupService:
         result = {"success": True, "files_deleted": 0, "space_freed": 0}
         
         try:
-            # Clean system temp directory
-            temp_dir = tempfile.gettempdir()
-            cutoff_time = datetime.now() - timedelta(days=self.temp_file_max_age)
-            
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                        if file_time < cutoff_time:
-                            file_size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            result["files_deleted"] += 1
-                            result["space_freed"] += file_size
-                    except Exception as e:
-                        logger.debug(f"Could not process temp file {file_path}: {e}")
-
-            # Clean app-specific temp directories
-            app_temp_dirs = [
-                "temp",
-                "tmp",
-                "cache",
-                ".cache",
-                "__pycache__"
-            ]
+            cutoff_ts = time.time() - self.temp_file_max_age * 86400
             
-            for temp_dir_name in app_temp_dirs:
-                for root, dirs, files in os.walk(".", topdown=True):
-                    # Skip hidden directories and common non-temp directories
-                    dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', 'venv', '.git']]
-                    
-                    if os.path.basename(root) == temp_dir_name:
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            try:
-                                file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                                if file_time < cutoff_time:
-                                    file_size = os.path.getsize(file_path)
-                                    os.remove(file_path)
-                                    result["files_deleted"] += 1
-                                    result["space_freed"] += file_size
-                            except Exception as e:
-                                logger.debug(f"Could not process file {file_path}: {e}")
+            # Clean system temp directory: stay on its filesystem and only remove
+            # regular files (never sockets, FIFOs or links)
+            self._remove_files(
+                _walk_old_files([tempfile.gettempdir()], cutoff_ts, regular_only=True, one_file_system=True),
+                result, "temp file"
+            )
+
+            # Clean app-specific temp directories (one pass over the project tree)
+            self._remove_files(
+                _walk_old_files(["."], cutoff_ts, prune=_skip_project_dir, only_in=_APP_TEMP_DIRS),
+                result, "temp file"
+            )
 
         except Exception as e:
             logger.error(f"Error cleaning temp files: {e}")
@@ -161,24 +258,10 @@ class CleanupService:
         result = {"success": True, "files_deleted": 0, "space_freed": 0}
         
         try:
-            cutoff_time = datetime.now() - timedelta(days=self.log_max_age)
-            log_dirs = ["logs", "log", ".logs"]
+            cutoff_ts = time.time() - self.log_max_age * 86400
+            log_dirs = [log_dir for log_dir in ("logs", "log", ".logs") if os.path.exists(log_dir)]
             
-            for log_dir in log_dirs:
-                if os.path.exists(log_dir):
-                    for root, dirs, files in os.walk(log_dir):
-                        for file in files:
-                            if file.endswith(('.log', '.out', '.err')):
-                                file_path = os.path.join(root, file)
-                                try:
-                                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                                    if file_time < cutoff_time:
-                                        file_size = os.path.getsize(file_path)
-                                        os.remove(file_path)
-                                        result["files_deleted"] += 1
-                                        result["space_freed"] += file_size
-                                except Exception as e:
-                                    logger.debug(f"Could not process log file {file_path}: {e}")
+            self._remove_files(_walk_old_files(log_dirs, cutoff_ts, name_filter=_is_log_file), result, "log file")
 
         except Exception as e:
             logger.error(f"Error cleaning logs: {e}")
@@ -201,37 +284,19 @@ class CleanupService:
             if not os.path.exists(uploads_dir):
                 return result
 
-            # Get all files referenced in database
-            referenced_files = set()
-            
-            # Check expense receipts
-            expenses = db.query(Expense).filter(Expense.receipt_url.isnot(None)).all()
-            for expense in expenses:
-                if expense.receipt_url:
-                    filename = expense.receipt_url.split('/')[-1]
-                    referenced_files.add(filename)
-
-            # Get all uploaded files
-            all_uploaded_files = set()
-            for root, dirs, files in os.walk(uploads_dir):
-                for file in files:
-                    all_uploaded_files.add(file)
-
-            # Find orphaned files
-            orphaned_files = all_uploaded_files - referenced_files
-            
-            for file in orphaned_files:
-                for root, dirs, files in os.walk(uploads_dir):
-                    if file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            file_size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            result["files_deleted"] += 1
-                            result["space_freed"] += file_size
-                            logger.info(f"Deleted orphaned upload: {file_path}")
-                        except Exception as e:
-                            logger.debug(f"Could not delete orphaned file {file_path}: {e}")
+            # Get all files referenced in database (expense receipts, streamed)
+            receipt_urls = db.query(Expense.receipt_url).filter(
+                Expense.receipt_url.isnot(None)
+            ).yield_per(1000)
+            referenced_files = {
+                receipt_url.rsplit('/', 1)[-1] for (receipt_url,) in receipt_urls if receipt_url
+            }
+
+            # Delete unreferenced files in a single pass over the uploads tree
+            self._remove_files(
+                _walk_old_files([uploads_dir], name_filter=lambda name: name not in referenced_files),
+                result, "orphaned upload", log_deletions=True
+            )
 
         except Exception as e:
             logger.error(f"Error cleaning orphaned uploads: {e}")
@@ -249,22 +314,12 @@ class CleanupService:
             if not os.path.exists(backup_dir):
                 return result
 
-            cutoff_time = datetime.now() - timedelta(days=self.backup_max_age)
+            cutoff_ts = time.time() - self.backup_max_age * 86400
             
-            for root, dirs, files in os.walk(backup_dir):
-                for file in files:
-                    if file.startswith("backup_"):
-                        file_path = os.path.join(root, file)
-                        try:
-                            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                            if file_time < cutoff_time:
-                                file_size = os.path.getsize(file_path)
-                                os.remove(file_path)
-                                result["files_deleted"] += 1
-                                result["space_freed"] += file_size
-                                logger.info(f"Deleted old backup: {file_path}")
-                        except Exception as e:
-                            logger.debug(f"Could not delete backup {file_path}: {e}")
+            self._remove_files(
+                _walk_old_files([backup_dir], cutoff_ts, name_filter=lambda name: name.startswith("backup_")),
+                result, "old backup", log_deletions=True
+            )
 
         except Exception as e:
             logger.error(f"Error cleaning old backups: {e}")
@@ -278,19 +333,24 @@ class CleanupService:
         result = {"success": True, "records_deleted": 0}
         
         try:
-            # Clean very old attendance records (older than 2 years)
+            # Clean very old attendance records (older than 2 years) in bounded
+            # batches, committing each one to keep transactions and locks short
             cutoff_date = datetime.now() - timedelta(days=730)
-            
-            old_attendances = db.query(Attendance).filter(
+            old_attendance_ids = select(Attendance.id).where(
                 Attendance.check_in < cutoff_date
-            ).count()
+            ).limit(DB_DELETE_BATCH_SIZE)
             
-            if old_attendances > 0:
-                db.query(Attendance).filter(
-                    Attendance.check_in < cutoff_date
-                ).delete()
-                result["records_deleted"] += old_attendances
-                logger.info(f"Deleted {old_attendances} old attendance records")
+            while True:
+                deleted = db.query(Attendance).filter(
+                    Attendance.id.in_(old_attendance_ids)
+                ).delete(synchronize_session=False)
+                db.commit()
+                result["records_deleted"] += deleted
+                if deleted < DB_DELETE_BATCH_SIZE:
+                    break
+            
+            if result["records_deleted"] > 0:
+                logger.info(f"Deleted {result['records_deleted']} old attendance records")
 
             # Clean old soft-deleted records (if implemented)
             # This would depend on your soft delete implementation
@@ -318,13 +378,23 @@ class CleanupService:
             "next_cleanup": datetime.now() + timedelta(hours=self.cleanup_interval) if self.running else None
         }
 
+    def _remove_files(self, files: Iterator[_FoundFile], result: Dict, kind: str, log_deletions: bool = False):
+        """Delete files, adding their count and size to result"""
+        for found in files:
+            try:
+                found.remove()
+                result["files_deleted"] += 1
+                result["space_freed"] += found.st.st_size
+                if log_deletions:
+                    logger.info(f"Deleted {kind}: {found.path}")
+            except Exception as e:
+                logger.debug(f"Could not delete {kind} {found.path}: {e}")
+
     def _format_bytes(self, bytes_size: int) -> str:
         """Format bytes to human readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.1f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.1f} PB"
+        # Unit index straight from the magnitude: every 10 bits is one 1024 step
+        idx = min((int(bytes_size).bit_length() - 1) // 10, len(_BYTE_UNITS) - 1) if bytes_size >= 1 else 0
+        return f"{bytes_size / (1 << (idx * 10)):.1f} {_BYTE_UNITS[idx]}"
 
     def manual_cleanup(self, db: Session = None) -> Dict:
         """Trigger manual cleanup"""
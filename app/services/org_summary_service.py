@@ -0,0 +1,211 @@
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, List, Optional
+import logging
+from sqlalchemy import delete, event, func
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models import Attendance, Expense, Organization, Project
+from app.models.org_summary import OrgSummary
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Organizations whose snapshot must be dropped when the session commits
+STALE_ORGS_KEY = "org_summary_stale_orgs"
+ALL_ORGS = "*"
+
+# Models the summaries are computed from
+SUMMARY_SOURCES = (Project, Expense, Attendance)
+SUMMARY_TABLES = frozenset(model.__tablename__ for model in SUMMARY_SOURCES)
+
+
+def _summarize(projects: List, spent_by_project: Dict, expense_count: int, attendance_count: int) -> Dict:
+    """Build the summary dict from project rows and per-project spending"""
+    # Proyectos pausados, con bajo progreso o con sobrecosto
+    urgent_projects = []
+    for p in projects:
+        project_spent = spent_by_project.get(p.id, 0.0)
+        status_lower = (p.status or "").lower()
+        entry = {
+            "name": p.name,
+            "status": p.status,
+            "progress": p.progress_percentage,
+            "budget": p.budget,
+            "spent": project_spent
+        }
+        if ('hold' in status_lower or 'pause' in status_lower or
+                (p.progress_percentage and p.progress_percentage < 20)):
+            urgent_projects.append(entry)
+        if p.budget and project_spent > p.budget * 0.9:
+            urgent_projects.append(entry)
+    
+    return {
+        "project_count": len(projects),
+        "expense_count": expense_count,
+        "attendance_count": attendance_count,
+        "total_budget": sum(p.budget for p in projects if p.budget),
+        "total_spent": sum(spent_by_project.values()),
+        "status_counts": dict(Counter(p.status for p in projects)),
+        "urgent_projects": urgent_projects[:5],
+        "active_projects": [
+            {"name": p.name, "status": p.status, "progress": p.progress_percentage}
+            for p in projects if p.status in ['in_progress', 'en_progreso', 'planificacion']
+        ][:5],
+        "project_names": [p.name for p in projects]
+    }
+
+
+def build_org_summary(projects: List, expenses: List, attendance: List) -> Dict:
+    """Build the organization aggregates used by the assistant's general answers"""
+    spent_by_project = defaultdict(float)
+    for e in expenses:
+        spent_by_project[e.project_id] += e.amount
+    return _summarize(projects, spent_by_project, len(expenses), len(attendance))
+
+
+def compute_org_summary(db: Session, organization_id: int) -> Dict:
+    """Same aggregates as build_org_summary, computed in SQL without loading expense/attendance rows"""
+    projects = db.query(
+        Project.id, Project.name, Project.status, Project.progress_percentage, Project.budget
+    ).filter(Project.organization_id == organization_id).order_by(Project.id).all()
+    
+    spent_by_project = {}
+    expense_count = 0
+    for project_id, count, total in db.query(
+        Expense.project_id, func.count(Expense.id), func.sum(Expense.amount)
+    ).filter(Expense.organization_id == organization_id).group_by(Expense.project_id):
+        spent_by_project[project_id] = float(total or 0)
+        expense_count += count
+    
+    attendance_count = db.query(func.count(Attendance.id)).filter(
+        Attendance.organization_id == organization_id
+    ).scalar()
+    return _summarize(projects, spent_by_project, expense_count, attendance_count)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_orgs(session, flush_context):
+    """Remember the organizations whose summary inputs changed in this flush"""
+    # Check-in/check-out updates don't change the attendance count
+    changed = chain(
+        (obj for obj in session.dirty if not isinstance(obj, Attendance)),
+        session.new,
+        session.deleted
+    )
+    for obj in changed:
+        if isinstance(obj, SUMMARY_SOURCES) and obj.organization_id is not None:
+            session.info.setdefault(STALE_ORGS_KEY, set()).add(obj.organization_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_stale_orgs(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE (Query.delete(), session.execute(delete(...))) skip the flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    # ORM-enabled statements and Core DML on the bare tables (e.g. the backup restore)
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in SUMMARY_TABLES:
+        # The statement doesn't say which organizations it touched
+        orm_execute_state.session.info.setdefault(STALE_ORGS_KEY, set()).add(ALL_ORGS)
+
+
+@event.listens_for(Session, "before_commit")
+def _drop_stale_summaries(session):
+    """Delete the changed organizations' snapshots in the committing transaction"""
+    # Flush first so the changes commit() is about to write are collected too
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    org_ids = session.info.pop(STALE_ORGS_KEY, None)
+    if not org_ids:
+        return
+    stmt = delete(OrgSummary.__table__)
+    if ALL_ORGS not in org_ids:
+        stmt = stmt.where(OrgSummary.organization_id.in_(org_ids))
+    session.connection().execute(stmt)
+
+
+class OrgSummaryService:
+    def __init__(self):
+        self.refresh_interval = int(os.getenv("ORG_SUMMARY_INTERVAL_MINUTES", "5"))  # minutes
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def max_age(self) -> timedelta:
+        """Snapshots older than two refresh intervals are considered stale"""
+        return timedelta(minutes=2 * self.refresh_interval)
+
+    def start_scheduler(self):
+        """Start the periodic summary refresh"""
+        if self.running:
+            return
+        
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._scheduler_loop, daemon=True)
+        self.thread.start()
+        logger.info("Org summary scheduler started")
+
+    def stop_scheduler(self):
+        """Stop the periodic summary refresh"""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=30)
+            if self.thread.is_alive():
+                logger.warning("Org summary refresh still running after stop timeout")
+        logger.info("Org summary scheduler stopped")
+
+    def _scheduler_loop(self):
+        """Main scheduler loop"""
+        while self.running:
+            db = SessionLocal()
+            try:
+                self.refresh_all(db)
+            except Exception as e:
+                logger.error(f"Error refreshing org summaries: {e}")
+            finally:
+                db.close()
+            self._stop_event.wait(self.refresh_interval * 60)
+
+    def refresh_all(self, db: Session) -> int:
+        """Recompute the summary of every active organization"""
+        org_ids = [org_id for (org_id,) in db.query(Organization.id).filter(Organization.is_active == True).all()]
+        refreshed = 0
+        for org_id in org_ids:
+            try:
+                self.refresh(db, org_id)
+                refreshed += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error refreshing summary for organization {org_id}: {e}")
+        return refreshed
+
+    def refresh(self, db: Session, organization_id: int) -> Dict:
+        """Recompute and store the summary of one organization"""
+        data = compute_org_summary(db, organization_id)
+        
+        summary = db.query(OrgSummary).filter(OrgSummary.organization_id == organization_id).first()
+        if summary:
+            summary.data = data
+            summary.updated_at = datetime.utcnow()
+        else:
+            db.add(OrgSummary(organization_id=organization_id, data=data))
+        db.commit()
+        return data
+
+    def get_fresh(self, db: Session, organization_id: int) -> Optional[Dict]:
+        """Return the stored summary if it is recent enough, otherwise None"""
+        summary = db.query(OrgSummary).filter(
+            OrgSummary.organization_id == organization_id,
+            OrgSummary.updated_at >= datetime.utcnow() - self.max_age
+        ).first()
+        return summary.data if summary else None
+
+
+# Global org summary service instance
+org_summary_service = OrgSummaryService()
@@ -0,0 +1,14 @@
+-- Create org_summaries table (precomputed AI assistant aggregates per organization)
+CREATE TABLE org_summaries (
+    id SERIAL PRIMARY KEY,
+    organization_id INT NOT NULL,
+    data JSON NOT NULL,
+    updated_at TIMESTAMP NULL
+);
+
+-- Add foreign key constraint
+ALTER TABLE org_summaries ADD CONSTRAINT fk_org_summaries_organization_id 
+FOREIGN KEY (organization_id) REFERENCES organizations(id);
+
+-- One summary per organization
+CREATE UNIQUE INDEX ix_org_summaries_organization_id ON org_summaries(organization_id);
@@ -0,0 +1,10 @@
+-- Create org_summaries table (precomputed AI assistant aggregates per organization, SQLite)
+CREATE TABLE org_summaries (
+    id INTEGER PRIMARY KEY,
+    organization_id INT NOT NULL REFERENCES organizations(id),
+    data JSON NOT NULL,
+    updated_at TIMESTAMP NULL
+);
+
+-- One summary per organization
+CREATE UNIQUE INDEX ix_org_summaries_organization_id ON org_summaries(organization_id);
@@ -7,6 +7,9 @@ from app.core.database import engine, Base
 from app.core.redis import get_redis, close_redis
 from app.api.routes import auth, users, attendance, expenses, projects, clients, files, organizations, reports, backup, cleanup, ml, notifications, budgets, security, documents, ai_assistant, admin, init_superadmin
 from app.services.cleanup_service import cleanup_service
+from app.services.ai_service import ai_service
+from app.services.org_summary_service import org_summary_service
+import asyncio
 import logging
 
 # Configure logging
@@ -59,6 +62,15 @@ if not settings.USE_S3:
     upload_dir.mkdir(parents=True, exist_ok=True)
     app.mount("/uploads", StaticFiles(directory=str(upload_dir)), name="uploads")
 
+async def warmup_ai():
+    """Warm up the local LLM prompt cache without holding up startup."""
+    try:
+        await ai_service.warmup()
+        logger.info("✅ AI warmup finished")
+    except Exception as e:
+        logger.warning(f"⚠️ AI warmup failed: {e}")
+
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
@@ -71,6 +83,9 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"⚠️ Redis connection failed: {e}")
     
+    # Warm up local LLM prompt cache in the background
+    app.state.ai_warmup_task = asyncio.create_task(warmup_ai())
+    
     # Start cleanup scheduler
     try:
         cleanup_service.start_scheduler()
@@ -78,6 +93,13 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"⚠️ Cleanup scheduler failed: {e}")
     
+    # Start org summary refresh for the AI assistant
+    try:
+        org_summary_service.start_scheduler()
+        logger.info("✅ Org summary scheduler started")
+    except Exception as e:
+        logger.warning(f"⚠️ Org summary scheduler failed: {e}")
+    
     logger.info("✅ Application started")
 
 @app.on_event("shutdown")
@@ -85,6 +107,11 @@ async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down...")
     cleanup_service.stop_scheduler()
+    org_summary_service.stop_scheduler()
+    warmup_task = getattr(app.state, "ai_warmup_task", None)
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await ai_service.aclose()
     await close_redis()
     logger.info("✅ Application stopped")
 
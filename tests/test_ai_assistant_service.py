@@ -0,0 +1,25 @@
+from app.services.ai_assistant_service import ai_assistant_service
+
+
+def test_prioritize_suggestions_orders_by_priority_then_cost():
+    """High priority and low cost come first."""
+    suggestions = [
+        {"title": "a", "priority": "baja", "cost": "bajo"},
+        {"title": "b", "priority": "alta", "cost": "alto"},
+        {"title": "c", "priority": "alta", "cost": "bajo"},
+        {"title": "d", "priority": "media", "cost": "medio"},
+    ]
+    ordered = ai_assistant_service._prioritize_suggestions(suggestions)
+    assert [s["title"] for s in ordered] == ["c", "b", "d", "a"]
+
+
+def test_prioritize_suggestions_sorts_unknown_values_last():
+    """Missing keys count as media/medio; unrecognised values rank like baja/alto."""
+    suggestions = [
+        {"title": "unknown-priority", "priority": "urgente", "cost": "bajo"},
+        {"title": "unknown-cost", "priority": "media", "cost": "gratis"},
+        {"title": "media", "priority": "media", "cost": "medio"},
+        {"title": "missing"},
+    ]
+    ordered = ai_assistant_service._prioritize_suggestions(suggestions)
+    assert [s["title"] for s in ordered] == ["media", "missing", "unknown-cost", "unknown-priority"]
@@ -0,0 +1,128 @@
+import json
+import os
+import zipfile
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import Expense, Organization, Project, User
+from app.services import backup_service as backup_module
+from app.services.backup_service import BackupService
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create tables before each test and drop after."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """A backup service writing zip backups under a temporary directory."""
+    monkeypatch.setenv("BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setenv("BACKUP_COMPRESSION", "zip")
+    return BackupService()
+
+
+@pytest.fixture
+def test_org(db):
+    """Create a test organization."""
+    org = Organization(name="Test Company", slug="test-company")
+    db.add(org)
+    db.commit()
+    return org
+
+
+def test_backup_dumps_the_callers_database(db, service, test_org):
+    """Table dumps and metadata counts come from the session passed in."""
+    result = service.create_backup(db)
+    assert result["success"]
+
+    with zipfile.ZipFile(result["backup_path"]) as zipf:
+        organizations = json.loads(zipf.read("database/organizations.json"))
+    assert [org["slug"] for org in organizations] == ["test-company"]
+    assert result["metadata"]["tables"]["organizations"] == 1
+
+
+def test_restore_round_trip(db, service, test_org):
+    """Restoring a backup replaces the tables with the backed-up rows."""
+    user = User(organization_id=test_org.id, email="test@test.com", username="testuser",
+                hashed_password="x", full_name="Test User")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        Expense(organization_id=test_org.id, user_id=user.id, amount=amount, category="c", description="d")
+        for amount in (10.5, 20, 30)
+    ])
+    db.commit()
+    backup = service.create_backup(db)
+
+    db.query(Expense).filter(Expense.amount == 20).delete()
+    db.add(Expense(organization_id=test_org.id, user_id=user.id, amount=99, category="c", description="d"))
+    db.commit()
+
+    result = service.restore_backup(backup["backup_path"], db)
+
+    assert result["success"]
+    assert sorted(amount for (amount,) in db.query(Expense.amount)) == [10.5, 20, 30]
+    assert db.query(User).count() == 1
+
+
+def test_restore_parses_datetime_columns(db, service, test_org):
+    """DateTime columns come back as datetimes; strings in other columns stay strings."""
+    start = datetime(2024, 3, 1, 8, 30, 15)
+    db.add(Project(organization_id=test_org.id, name="2024-03-01T08:30:15", start_date=start))
+    db.commit()
+    backup = service.create_backup(db)
+
+    result = service.restore_backup(backup["backup_path"], db)
+
+    assert result["success"]
+    db.expire_all()
+    project = db.query(Project).one()
+    assert project.start_date == start
+    assert project.end_date is None
+    assert isinstance(project.created_at, datetime)
+    assert project.name == "2024-03-01T08:30:15"
+
+
+def test_listing_picks_up_metadata_written_after_the_directory(service):
+    """A directory backup listed mid-write shows its metadata once it lands."""
+    backup_path = os.path.join(service.backup_dir, "backup_20240301_083015")
+    os.makedirs(backup_path)
+    assert "metadata" not in service.list_backups()[0]
+
+    with open(os.path.join(backup_path, "metadata.json"), "w") as f:
+        json.dump({"backup_version": "1.0"}, f)
+
+    assert service.list_backups()[0]["metadata"] == {"backup_version": "1.0"}
+
+
+def test_zip_backup_archives_uploads(db, service, tmp_path, monkeypatch):
+    """Small files deflated in parallel under the in-flight bound and large streamed files all archive intact."""
+    monkeypatch.setattr(backup_module, "PARALLEL_DEFLATE_MAX_SIZE", 4096)
+    monkeypatch.setattr(backup_module, "PARALLEL_DEFLATE_MAX_INFLIGHT", 8192)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    files = {f"file_{size}.bin": os.urandom(size) for size in (0, 100, 3000, 4096, 5000, 20000)}
+    for name, data in files.items():
+        (uploads / name).write_bytes(data)
+
+    result = service.create_backup(db)
+    assert result["success"]
+
+    with zipfile.ZipFile(result["backup_path"]) as zipf:
+        assert zipf.testzip() is None
+        for name, data in files.items():
+            assert zipf.read(f"files/uploads/{name}") == data
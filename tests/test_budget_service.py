@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import Organization, User
+from app.models.budget import Budget, BudgetAlert, BudgetTransaction, BudgetType
+from app.services.budget_service import budget_service
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create tables before each test and drop after."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def budget_id(db):
+    """A 40 USD monthly budget with the default 80/95 % thresholds."""
+    org = Organization(name="Test Company", slug="test-company")
+    db.add(org)
+    db.commit()
+    user = User(organization_id=org.id, email="test@test.com", username="testuser",
+                hashed_password="x", full_name="Test User")
+    db.add(user)
+    db.commit()
+    now = datetime.utcnow()
+    result = budget_service.create_budget(
+        db, org.id, "Mensual", "", BudgetType.MONTHLY, 40.0, now, now + timedelta(days=30), user.id
+    )
+    assert result["success"]
+    return result["budget"]["id"]
+
+
+def test_retried_expense_is_charged_once(db, budget_id):
+    """A retried expense_id must not double-charge the budget."""
+    first = budget_service.update_budget_spending(db, budget_id, 35, expense_id=1)
+    second = budget_service.update_budget_spending(db, budget_id, 35, expense_id=1)
+
+    assert first["success"] and not first.get("duplicate")
+    assert first["alerts_created"] == ["warning"]
+    assert second["success"] and second["duplicate"] is True
+    assert second["alerts_created"] == []
+
+    db.expire_all()
+    assert db.get(Budget, budget_id).spent_amount == 35
+    assert db.query(BudgetTransaction).filter(BudgetTransaction.budget_id == budget_id).count() == 1
+    assert db.query(BudgetAlert).filter(
+        BudgetAlert.budget_id == budget_id, BudgetAlert.alert_type == "warning"
+    ).count() == 1
+
+
+def test_distinct_expenses_are_both_charged(db, budget_id):
+    """Different expense ids still add up."""
+    budget_service.update_budget_spending(db, budget_id, 10, expense_id=1)
+    budget_service.update_budget_spending(db, budget_id, 15, expense_id=2)
+
+    db.expire_all()
+    assert db.get(Budget, budget_id).spent_amount == 25
+    assert db.query(BudgetTransaction).filter(BudgetTransaction.budget_id == budget_id).count() == 2
+
+
+def test_missing_budget_is_reported(db, budget_id):
+    """A missing budget is not mistaken for a duplicate charge."""
+    result = budget_service.update_budget_spending(db, budget_id + 1, 10, expense_id=1)
+
+    assert result == {"success": False, "error": "Budget not found"}
@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import Attendance, Expense, Organization, Project, User
+import app.models.org_summary  # noqa: F401 (registers the org_summaries table)
+from app.services.org_summary_service import org_summary_service
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create tables before each test and drop after."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def org_with_snapshot(db):
+    """An organization with one member and a fresh summary snapshot."""
+    org = Organization(name="Test Company", slug="test-company")
+    db.add(org)
+    db.commit()
+    user = User(
+        organization_id=org.id,
+        email="test@test.com",
+        username="testuser",
+        hashed_password="x",
+        full_name="Test User"
+    )
+    db.add(user)
+    db.commit()
+    org_summary_service.refresh(db, org.id)
+    return org, user
+
+
+def test_snapshot_dropped_after_project_commit(db, org_with_snapshot):
+    """Creating the first project must not leave a 'no projects' snapshot behind."""
+    org, _ = org_with_snapshot
+    assert org_summary_service.get_fresh(db, org.id)["project_count"] == 0
+
+    db.add(Project(name="Obra Norte", organization_id=org.id))
+    db.commit()
+
+    assert org_summary_service.get_fresh(db, org.id) is None
+
+
+def test_snapshot_dropped_with_the_write_not_before(db, org_with_snapshot):
+    """The snapshot stays until the write commits, and a rollback keeps it."""
+    org, user = org_with_snapshot
+    db.add(Expense(organization_id=org.id, user_id=user.id, amount=10, category="c", description="d"))
+    db.flush()
+    other = TestingSessionLocal()
+    try:
+        assert org_summary_service.get_fresh(other, org.id) is not None
+    finally:
+        other.close()
+
+    db.rollback()
+    assert org_summary_service.get_fresh(db, org.id) is not None
+
+
+def test_snapshot_dropped_after_bulk_delete(db, org_with_snapshot):
+    """Bulk deletes (e.g. the attendance purge) skip the flush but still invalidate."""
+    org, user = org_with_snapshot
+    db.add(Attendance(organization_id=org.id, user_id=user.id))
+    db.commit()
+    org_summary_service.refresh(db, org.id)
+    assert org_summary_service.get_fresh(db, org.id)["attendance_count"] == 1
+
+    db.query(Attendance).filter(Attendance.organization_id == org.id).delete(synchronize_session=False)
+    db.commit()
+
+    assert org_summary_service.get_fresh(db, org.id) is None
+
+
+def test_snapshot_dropped_after_core_delete(db, org_with_snapshot):
+    """Core DML on the bare table (as in the backup restore) also invalidates."""
+    org, _ = org_with_snapshot
+
+    db.execute(delete(Project.__table__))
+    db.commit()
+
+    assert org_summary_service.get_fresh(db, org.id) is None
+
+
+def test_snapshot_kept_after_check_out(db, org_with_snapshot):
+    """Attendance updates don't change the summary, so the snapshot is kept."""
+    org, user = org_with_snapshot
+    attendance = Attendance(organization_id=org.id, user_id=user.id)
+    db.add(attendance)
+    db.commit()
+    org_summary_service.refresh(db, org.id)
+
+    attendance.hours_worked = 8
+    db.commit()
+
+    assert org_summary_service.get_fresh(db, org.id)["attendance_count"] == 1
+
+
+def test_refresh_matches_rows(db, org_with_snapshot):
+    """refresh() aggregates counts and spending per project in SQL."""
+    org, user = org_with_snapshot
+    project = Project(name="Obra Norte", organization_id=org.id, budget=100, status="in_progress")
+    db.add(project)
+    db.commit()
+    for amount in (50, 45.5):
+        db.add(Expense(organization_id=org.id, user_id=user.id, project_id=project.id,
+                       amount=amount, category="c", description="d"))
+    db.add(Expense(organization_id=org.id, user_id=user.id, amount=7, category="c", description="d"))
+    db.commit()
+
+    data = org_summary_service.refresh(db, org.id)
+
+    assert data["project_count"] == 1
+    assert data["expense_count"] == 3
+    assert data["total_spent"] == 102.5
+    assert data["urgent_projects"][0]["spent"] == 95.5
+    assert org_summary_service.get_fresh(db, org.id) == data